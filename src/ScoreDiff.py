@@ -8,726 +8,4021 @@
 
 """
 
-import music21.environment
-from music21.corpus import base
+from __future__ import print_function
+from bisect import bisect_right
+from collections import Counter, OrderedDict, namedtuple
+import copy
+import importlib
+import os
+import struct
+import sys
 import logging
-logging.basicConfig(filename='debug.log', level = logging.DEBUG)
-logging.disable(logging.DEBUG)
 import math
 
+#music21, hashlib, json, multiprocessing, the HTTP server and the command line modules are imported
+#where they are first used, so importing ScoreDiff stays cheap for tools that never parse a score
+
+#Diagnostics go through this logger and are only written out if the application configures logging
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+def _music21(name):
+    """Imports a music21 module the first time it is needed
+
+    Args:
+      name (str):  The name of the module within the music21 package, e.g. 'converter'
+
+    Returns:
+      module
+
+    """
+    return importlib.import_module('music21.' + name)
+
+#The sorted files under each corpus path that has been searched, keyed by its absolute path
+_corpus_files = {}
+
+def _find_score(name, localCorpusPath):
+    """Finds the file of a score on disk, the way ScoreDiff.__parse__ looks for it
+
+    The name is looked up in localCorpusPath first, then as given, then anywhere under
+    localCorpusPath, as music21 did when it was set as its local corpus.
+
+    Args:
+      name (str):  The pathname of a score
+
+      localCorpusPath (str):  The corpus path the name may be relative to
+
+    Returns:
+      str.  The pathname of the file, or None if it is not on disk, e.g. a music21 corpus name
+
+    """
+    path = os.path.join(localCorpusPath, name)
+
+    if(os.path.isfile(path)):
+        return path
+
+    if(os.path.isfile(name)):
+        return name
+
+    return _find_in_corpus(name, localCorpusPath)
+
+def _find_in_corpus(name, localCorpusPath):
+    """Looks for a score anywhere under the corpus path
+
+    A file matches when its path ends with the name, or, for a name without the extension of a
+    score, when it is a score whose path without the extension does.  The files under a corpus
+    path are listed once per process, so files added under it later are only found when they are
+    named relative to it.
+
+    Args:
+      name (str):  The pathname of a score, relative to some directory under localCorpusPath
+
+      localCorpusPath (str):  The corpus path to search
+
+    Returns:
+      str.  The pathname of the first match in sorted order, or None if there is none
+
+    """
+    if(not os.path.isdir(localCorpusPath)):
+        return None
+
+    root = os.path.abspath(localCorpusPath)
+    files = _corpus_files.get(root)
+
+    if(files is None):
+        files = []
+
+        for directory, subdirectories, names in os.walk(root):
+            files += [os.path.join(directory, found) for found in names]
+
+        files = _corpus_files[root] = sorted(files)
+
+    target = os.sep + os.path.normpath(name)
+
+    for path in files:
+
+        stem, extension = os.path.splitext(path)
+
+        if(path.endswith(target) or (not os.path.splitext(name)[1].lower() in _score_extensions and
+                                     extension.lower() in _score_extensions and stem.endswith(target))):
+            return path
+
+    return None
+
 class ScoreDiff:
     """The ScoreDiff class uses the music21 toolkit to parse and analyze two scores passed
     to the initialization function, so that the user can detect and display certain differences.
 
     """
-    
-    #This ornaments list is used as a reference when comparing ornaments    
+
+    #This ornaments list is used as a reference when comparing ornaments; each name is a class of music21.expressions
     ornaments = ['Appoggiatura', 'GeneralAppoggiatura', 'GeneralMordent', 'HalfStepAppoggiatura',
-                 'HalfSetpInvertedAppoggiatura', 'HalfStepInvertedMordent', 'HalfStepMordent', 'HalfStepTrill',
+                 'HalfStepInvertedAppoggiatura', 'HalfStepInvertedMordent', 'HalfStepMordent', 'HalfStepTrill',
                  'InvertedAppoggiatura', 'InvertedMordent', 'InvertedTurn', 'Mordent', 'Schleifer', 'Shake',
                  'Tremolo', 'Trill', 'Turn', 'WholeStepAppoggiatura', 'WholeStepInvertedAppoggiatura',
                  'WholeStepInvertedMordent', 'WholeStepMordent', 'WholeStepTrill']
 
-    def __init__(self, score1, score2, localCorpusPath = '.'):
+    #The attributes diff_all compares; each name matches a have_same_<name> method
+    attributes = ['accidentals', 'articulations', 'clef_markings', 'key_signature', 'ornaments',
+                  'pitches', 'pitches_ignore_order', 'spanners', 'stem_directions', 'time_signature']
+
+    #More attributes that can be asked for by name but are not compared by default; each compares
+    #the counts of a field's values like pitches_ignore_order, without regard to their order
+    ignore_order_attributes = ['accidentals_ignore_order', 'articulations_ignore_order',
+                               'ornaments_ignore_order', 'spanners_ignore_order']
+
+    #Parsed scores shared by every ScoreDiff that is not given its own cache; None, the default, parses
+    #every score, since a shared cache keeps whole scores alive after release and hands the same
+    #Score object to every ScoreDiff of the process, so set it to a ParseCache only when that is wanted
+    parse_cache = None
+
+    #The methods a Profile records: parsing and every comparison method
+    profiled = (['__parse__', 'diff_all', 'iter_differences', 'align_measures', 'changed_measures', 'diff_aligned',
+                 'pitch_matches', 'have_same_part_pitches', 'have_same_part_spanners', 'have_same_ignore_order'] +
+                list(map('have_same_{0}'.format, attributes + ignore_order_attributes)))
+
+    def __init__(self, score1, score2, localCorpusPath = '.', parseCache = None, profile = None):
         """Initializes a ScoreDiff object.
-    
+
         Args:
-         score1 (str):  The pathname of a score to parse
-         
-	 score2 (str):  The pathname of a score to parse and compare to score1
+         score1 (str):  The pathname of a score to parse, or a ScoreIndex that has already been built
+
+         score2 (str):  The pathname of a score to parse and compare to score1, or a ScoreIndex
 
         Kwargs:
-         localCorpusPath (str)  A path to a corpus if your files are located elsewhere
+         localCorpusPath (str)  A path to a corpus if your files are located elsewhere; it only applies to this instance and music21's settings are left alone
 
-	"""        
-	music21.environment.set('localCorpusPath', localCorpusPath)
-        self.score1 = base.parse(score1)
-       	self.score2 = base.parse(score2)
-        self.name1 = score1
-        self.name2 = score2
-	
-    def display(self, msr=0, part=0):
-        """Useful for displaying the differences between the two scores visually
+         parseCache (ParseCache)  A cache of parsed scores to use instead of ScoreDiff.parse_cache, or False to parse without one
 
-        Kwargs:
-          msr (int): A measure number to display
+         profile (Profile)  Records the time spent parsing, extracting and comparing; indexes passed in are only profiled if they were built with it
 
-	  part (int): A part number to examine.  
-          
-	  
         """
-	self.__verify_part_and_measure__(msr, part)	
-	
-	partial1 = self.score1.parts[part].getElementsByClass('Measure')[msr]
-	partial2 = self.score2.parts[part].getElementsByClass('Measure')[msr]
-        partial1.show()
-        partial2.show()
+        if(parseCache is None):
+            parseCache = ScoreDiff.parse_cache
 
-    def have_same_accidentals(self, msr=0, part=0):
-        """Checks if the two scores both have the same accidentals at the specified measure and for the specified part
+        if(parseCache is False):
+            parseCache = None
 
-        Kwargs:
-          msr (int):  the measure number at which to make the comparison
-          
-	  part (int): the part for which to make the comparison
+        self.localCorpusPath = localCorpusPath
+        self.parseCache = parseCache
+        self.profile = profile
 
-        Returns:
-           boolean.   The result of the comparison::
+        if(not profile is None):
+            profile.instrument(self, ScoreDiff.profiled)
 
-            True -- The scores have the same accidentals
-            False -- The scores do not have the same accidentals
+        self.index1 = self.__build_index__(score1, localCorpusPath, parseCache)
+        self.index2 = self.__build_index__(score2, localCorpusPath, parseCache)
+        self.score1 = self.index1.score
+        self.score2 = self.index2.score
+        self.name1 = self.index1.name
+        self.name2 = self.index2.name
 
-        Raises:
-          ScoreException
-       
-        """
-	self.__verify_part_and_measure__(msr, part)
+    def __getstate__(self):
+        """Gets what is pickled of this ScoreDiff: everything but its Profile and the wrappers it installed
+
+        The wrappers are closures, which cannot be pickled, so a copy made in another process runs unprofiled.
 
-        measures1 = self.score1.parts[part].getElementsByClass('Measure')
-	measures2 = self.score2.parts[part].getElementsByClass('Measure')
-	notes1 = measures1[msr].flat.notes
-        notes2 = measures2[msr].flat.notes
-	accidentals1 = []
-	accidentals2 = []
+        """
+        state = dict((name, value) for name, value in self.__dict__.items() if not name in ScoreDiff.profiled)
+        state['profile'] = None
 
-	if(measures1[msr].keySignature == None):
-		
-		measure_of_last_key_change = self.__get_most_recent_key__(msr, part, 1)
-		altered1 = self.score1.parts[part].measure(measure_of_last_key_change).keySignature.alteredPitches
-		altered1 = [x.name for x in altered1]
-		
-	else:
+        return state
 
-		altered1 = measures1[msr].keySignature.alteredPitches
-		altered1 = [x.name for x in altered1]
+    def __build_index__(self, score, localCorpusPath, parseCache):
+        """Builds the ScoreIndex of a score, parsing it unless it is already a ScoreIndex
 
-	if(measures2[msr].keySignature == None):
-		
-		measure_of_last_key_change = self.__get_most_recent_key__(msr, part, 2)
-		altered2 = self.score1.parts[part].measure(measure_of_last_key_change).keySignature.alteredPitches
-		altered2 = [x.name for x in altered2]
-	else:
-		
-		altered2 = measures2[msr].keySignature.alteredPitches
-		altered2 = [x.name for x in altered2]
+        Args:
+          score (str): The pathname of a score to parse, or a ScoreIndex
 
-        for index in range(0, len(notes1)):
+          localCorpusPath (str): The corpus path the name may be relative to
 
-        	if(notes1[index].isChord):
+          parseCache (ParseCache): The cache to use, or None to always parse
 
-			for pitch in notes1[index].pitches:
+        Returns:
+          ScoreIndex
 
-				if(not pitch.accidental is None and not pitch.name in altered1):
+        """
+        if(isinstance(score, ScoreIndex)):
+            return score
 
-					accidentals1.append(pitch.accidental)
+        return ScoreIndex(self.__parse__(score, localCorpusPath, parseCache), score, self.profile)
 
-		elif(not notes1[index].accidental is None and not notes1[index].name in altered1):
+    def update(self, score, score_number=2, measures=None):
+        """Replaces one of the scores with a new version of it, reusing what is known about unchanged measures
 
-			accidentals1.append(notes1[index].accidental)
-            		
-	for index in range(0, len(notes2)):
-		
-		if(notes2[index].isChord):
+        Only the new version is parsed.  When the edited measures are given, the features and
+        fingerprints of every other measure are carried over from the previous version, unless the
+        key, clef or time signature in effect there changed as a result of the edit; only those
+        measures are extracted again.  Parts whose number of measures changed are extracted again
+        in full.  Without the edited measures every measure of the new version is extracted again
+        when it is next compared.
 
-			for  pitch in notes2[index].pitches:
+        Args:
+          score (str): The pathname of the new version, or a ScoreIndex of it
 
-				if(not pitch.accidental is None and not pitch.name in altered2):
+        Kwargs:
+          score_number (int): which score the new version replaces, 1 or 2
 
-					accidentals2.append(pitch.accidental)
+          measures (dict): maps part numbers to the measure numbers that were edited; a list
+          instead applies to every part
 
-		elif(not notes2[index].accidental is None and not notes2[index].name in altered2):
+        """
+        previous = self.__get_index__(score_number)
+        index = self.__build_index__(score, self.localCorpusPath, self.parseCache)
 
-			accidentals2.append(notes2[index].accidental)
-	
-	logging.debug("accidentals1: " +str(accidentals1)) 
-	logging.debug("accidentals2: " +str(accidentals2))
-	return accidentals1 == accidentals2
+        if(not measures is None):
 
-    def __get_most_recent_key__(self, msr=0, part=0, score_number=1):
-        """Gets the measure number of the most recent key change
-	
-	Kwargs:
-	  msr (int): measure number that is used to determine what is considered the most recent key change
+            if(not isinstance(measures, dict)):
+                measures = dict((part, measures) for part in range(0, index.part_count()))
 
-	  part (int): the part to examine
+            index.reuse(previous, measures)
 
-	  score_number (int): A score number so the function knows which score to analyze
+        if(score_number == 1):
+            self.index1 = index
+            self.score1 = index.score
+            self.name1 = index.name
 
-	Returns:
-	  int:	the measure number of the most recent key change
+        else:
+            self.index2 = index
+            self.score2 = index.score
+            self.name2 = index.name
 
-	"""
-	if(score_number == 1):
+    def release(self):
+        """Extracts the features of every measure of both scores and then lets go of the parsed scores
 
-		keys = self.score1.parts[part].flat.getKeySignatures()
-		target_measure = self.score1.parts[part].getElementsByClass('Measure')[msr].measureNumber
+        The comparison methods keep working from the extracted MeasureFeatures, but display can no
+        longer be used.  Scores that are still held by a ParseCache are not freed until the cache
+        drops them as well.
 
-	elif(score_number == 2):
+        """
+        self.index1.release()
+        self.index2.release()
+        self.score1 = None
+        self.score2 = None
 
-		keys = self.score2.parts[part].flat.getKeySignatures()
-		target_measure = self.score2.parts[part].getElementsByClass('Measure')[msr].measureNumber
-	
-	current = 0
+    def __parse__(self, name, localCorpusPath, parseCache):
+        """Parses a score, going through the parse cache when the file can be found on disk
 
-	for key in keys:
+        The file is found with _find_score, and a name that is not on disk is looked up in the
+        music21 corpus.
 
-		if(key.measureNumber > current and key.measureNumber <= target_measure):
+        Args:
+          name (str): The pathname of a score to parse
 
-			current = key.measureNumber
-		
-	logging.debug("most recent key was: "+str(current))
-	return current	
+          localCorpusPath (str): The corpus path the name may be relative to
 
-    def have_same_articulations(self, msr=0, part=0):
-        """Checks if the two scores both have the same articulations at the specified measure and for the specified part [#f2]_
-	
-	Kwargs:
-          msr (int):  the measure number at which to make the comparison
-          
-	  part (int): the part for which to make the comparison
+          parseCache (ParseCache): The cache to use, or None to always parse
 
         Returns:
-          boolean.   The result of the comparison::
+          music21.stream.Score
 
-           True -- The scores have the same articulations
-           False -- The scores do not have the same articulations
+        """
+        path = _find_score(name, localCorpusPath)
+
+        if(path is None):
+            return _music21('corpus').parse(name)
+
+        if(parseCache is None):
+            return _music21('converter').parse(path)
+
+        key = parseCache.key(path)
+        score = parseCache.get(key)
+
+        if(score is None):
+            score = _music21('converter').parse(path)
+            parseCache.put(key, score)
+
+        return score
+
+    def display(self, msr=0, part=0):
+        """Useful for displaying the differences between the two scores visually
+
+        Kwargs:
+          msr (int): A measure number to display
+
+          part (int): A part number to examine.
 
-        Raises:
-          ScoreException
-       
 
         """
+        self.__verify_part_and_measure__(msr, part)
 
-	self.__verify_part_and_measure__(msr, part)
-                
-	notes1 = self.score1.parts[part].getElementsByClass('Measure')[msr].flat.notes
-        notes2 = self.score2.parts[part].getElementsByClass('Measure')[msr].flat.notes
-	articulations1 = []
-	articulations2 = []
-        
-        for index in range(0, len(notes1)):
-            
-        	articulations1 += notes1[index].articulations
+        if(self.score1 is None or self.score2 is None):
 
-	for index in range(0, len(notes2)):
+                raise ScoreException("the scores have been released and can no longer be displayed")
 
-		articulations2 += notes2[index].articulations
-        	
-	logging.debug("articulations1: " +str(articulations1))
-	logging.debug("articulations2: "+ str(articulations2))
-        return articulations1 == articulations2
+        partial1 = self.index1.measures(part)[msr]
+        partial2 = self.index2.measures(part)[msr]
+        partial1.show()
+        partial2.show()
 
-    def have_same_clef_markings(self, msr=0, part=0):
-        """Checks if the two scores both have the same clef markings at the specified measure and for the specified part
+    def diff_all(self, parts=None, attributes=None, processes=None, chunk_size=None):
+        """Compares every measure of every part in a single pass over both scores
+
+        Each measure is flattened and its features extracted once per score, and every requested
+        attribute is compared from those features, so the cost of a full-score comparison grows
+        linearly with the size of the scores.  Measures are compared by index, up to the length of
+        the shorter part.
+
+        For very large scores the parts can be cut into ranges of measures that are compared by a
+        pool of worker processes.  The ranges are put back together in order, so the report is the
+        same however many processes are used.  Where processes are spawned rather than forked, the
+        scores are released before the pool starts, so display can no longer be used afterwards.
 
         Kwargs:
-          msr (int):  the measure number at which to make the comparison
-          
-	  part (int): the part for which to make the comparison
+          parts (list): the part numbers to compare, defaults to every part both scores share
+
+          attributes (list): names from ScoreDiff.attributes to compare, defaults to all of them
+
+          processes (int): how many worker processes to use, defaults to comparing in this process
+
+          chunk_size (int): how many measures each worker compares at a time, defaults to a size
+          that gives every process several ranges
 
         Returns:
-          boolean.   The result of the comparison::
+          dict.  Maps each part number to a list with one dict per measure, which in turn maps
+          each attribute name to the result of the comparison::
 
-           True -- The scores have the same clef markings
-           False -- The scores do not have the same clef markings
+            {0: [{'pitches': True, 'key_signature': False, ...}, ...], ...}
 
         Raises:
           ScoreException
-       
+
         """
-	self.__verify_part_and_measure__(msr, part)
-	measures1 = self.score1.parts[part].getElementsByClass('Measure')
-	measures2 = self.score2.parts[part].getElementsByClass('Measure')
-        clef1 = measures1[msr].clef
-        clef2 = measures2[msr].clef
-	
-	if(clef1 == None): 
+        parts, attributes, counts = self.__check_request__(parts, attributes)
 
-		current = self.__get_most_recent_clef__(msr, part, 1)
-		clef1 = self.score1.parts[part].measure(current).clef
+        if(processes is None or processes <= 1):
+            return dict((part, self.__diff_range__(part, 0, counts[part], attributes)) for part in parts)
 
-	if(clef2 == None):
+        if(chunk_size is None):
+            chunk_size = max(1, sum(counts.values()) // (processes * 4))
 
-		current = self.__get_most_recent_clef__(msr, part, 2)
-		clef2 = self.score2.parts[part].measure(current).clef
-        	
-	logging.debug("clef1.sign: " + str(clef1.sign))
-	logging.debug("clef2.sign: " + str(clef2.sign))
-	return clef1.sign == clef2.sign
-    
+        ranges = [(part, start, min(start + chunk_size, counts[part]), attributes)
+                  for part in parts for start in range(0, counts[part], chunk_size)]
 
-    def __get_most_recent_clef__(self, msr=0, part=0, score_number=1):
-        """Gets the measure number of the most recent clef change
-	
-	Kwargs:
-	  msr (int):  the measure number of the most recent clef change
+        import multiprocessing
 
-	  part (int): the part to examine
+        #forked workers inherit this ScoreDiff, so the tables every measure of a part is extracted with
+        #are built here once rather than again in every worker; spawned workers are sent released
+        #copies of the indexes, so only their features are pickled and this ScoreDiff keeps its scores
+        if(getattr(multiprocessing, 'get_start_method', lambda: 'spawn' if os.name == 'nt' else 'fork')() == 'fork'):
 
-	  score_number (int): A score number so the function knows which score to analyze
+            for part in parts:
+                self.index1.prepare(part)
+                self.index2.prepare(part)
 
-	Returns:
-	  int.  The measure number of the most recent clef change
+            indexes = (self.index1, self.index2)
 
-	"""
-	if(score_number == 1):
+        else:
+            indexes = (self.index1.detached(), self.index2.detached())
 
-		clefs = self.score1.parts[part].flat.getClefs()
-		target_measure = self.score1.parts[part].getElementsByClass('Measure')[msr].measureNumber
+        _range_worker['diff'] = self
+        pool = multiprocessing.Pool(processes, _init_range_worker, indexes)
 
-	elif(score_number == 2):
+        try:
+            chunks = sorted(pool.imap_unordered(_diff_range, ranges))
 
-		clefs = self.score2.parts[part].flat.getClefs()
-		target_measure = self.score2.parts[part].getElementsByClass('Measure')[msr].measureNumber
+        finally:
+            _range_worker.clear()
+            pool.terminate()
+            pool.join()
 
-	current = 0
+        report = dict((part, []) for part in parts)
 
-	for clef in clefs:
+        for part, start, results in chunks:
+            report[part] += results
 
-		if(clef.measureNumber > current and clef.measureNumber <= target_measure):
+        return report
 
-			current = clef.measureNumber
-	
-	
-	logging.debug("most recent clef found: " + str(current))
-	return current
+    def iter_differences(self, parts=None, attributes=None, detailed=False, measures=None, keep=False):
+        """Compares every measure of every part like diff_all, yielding each difference as soon as it is found
 
+        Measures are extracted one at a time and by default not kept in the indexes, so memory use
+        does not grow with the size of the scores and a consumer can handle the first differences
+        before the last measures have been compared.  Measures the indexes already hold are used as
+        they are.
 
+        Kwargs:
+          parts (list): the part numbers to compare, defaults to every part both scores share
 
-    def have_same_key_signature(self, msr=0, part=0):
-        """Checks if the two scores both have the same key signature at the specified measure and for the specified part
+          attributes (list): names from ScoreDiff.attributes to compare, defaults to all of them
 
-        Kwargs:
-          msr (int):  the measure number at which to make the comparison
-          
-	  part (int): the part for which to make the comparison
+          detailed (bool): add the differences from a ComparisonResult to every record
+
+          measures (tuple): a (start, stop) range of measures to compare, where stop may be None for
+          the end of the part, defaults to every measure
+
+          keep (bool): keep the extracted measures in the indexes for later comparisons
 
         Returns:
-          boolean.   The result of the comparison::
+          generator.  One dict per part, measure and attribute that differs, in score order::
 
-           True -- The scores have the same key
-           False -- The scores do not have the same key
+            {'part': 0, 'measure': 3, 'attribute': 'pitches'}
+
+          with a 'differences' list of Difference tuples when detailed is True
 
         Raises:
           ScoreException
-       
 
         """
-        self.__verify_part_and_measure__(msr, part)
-        measures1 = self.score1.parts[part].getElementsByClass('Measure')
-	measures2 = self.score2.parts[part].getElementsByClass('Measure')
-	key_signature1 = measures1[msr].keySignature
-        key_signature2 = measures2[msr].keySignature
+        parts, attributes, counts = self.__check_request__(parts, attributes)
 
-	if(key_signature1 == None):
+        start, stop = (0, None) if measures is None else measures
 
-		current = self.__get_most_recent_key__(msr, part , 1)	
-		key_signature1 = self.score1.parts[part].measure(current).keySignature
+        if(start < 0 or (not stop is None and stop < start)):
+            raise ScoreException("invalid measure range " + str(measures))
 
-	if(key_signature2 == None):
-		
-		current = self.__get_most_recent_key__(msr, part, 2)
-		key_signature2 = self.score2.parts[part].measure(current).keySignature        	
-	
-	logging.debug("key signature 1.sharps: "+str(key_signature1.sharps))
-	logging.debug("key signature 2.sharpts: "+str(key_signature2.sharps))
-	return key_signature1.sharps == key_signature2.sharps
+        for part in parts:
 
+            for msr in range(start, counts[part] if stop is None else min(stop, counts[part])):
 
-    def have_same_ornaments(self, msr=0, part=0):
-        """Checks if the two scores both have the same ornaments at the specified measure and for the specified part
+                features1 = self.index1.features(part, msr, keep)
+                features2 = self.index2.features(part, msr, keep)
 
-        Kwargs:
-          msr (int):  the measure number at which to make the comparison
-          
-	  part (int): the part for which to make the comparison
+                if(features1.fingerprint() == features2.fingerprint()):
+                    continue
 
-        Returns:
-          boolean.   The result of the comparison::
+                for attribute in attributes:
 
-           True -- The scores have the same ornaments
-           False -- The scores do not have the same ornaments
+                    if(features1.value(attribute) == features2.value(attribute)):
+                        continue
 
-        Raises:
-          ScoreException
-       
-        """
-
-	self.__verify_part_and_measure__(msr, part)
-        
-        notes1 = self.score1.parts[part].getElementsByClass('Measure')[msr].flat.notes
-        notes2 = self.score2.parts[part].getElementsByClass('Measure')[msr].flat.notes
-        ornaments1 = []
-	ornaments2 = []
-
-        for index in range(0, len(notes1)):
-            
-            e1 = notes1[index].expressions
-                        
-            
-            for inner_index in range(0, len(e1)):
-                
-                classes = e1[inner_index].classes
-		    
-		for third_index in range(0, len(classes)):
-
-			if(classes[third_index] in ScoreDiff.ornaments):
-                    
-                    		ornaments1.append(classes[third_index])
-                
-	for index in range(0, len(notes2)):
-
-	    e2 = notes2[index].expressions
-	    
-            for inner_index in range(0, len(e2)):
-                
-                classes = e2[inner_index].classes
-
-		for third_index in range(0, len(classes)):
-		    
-			if(classes[third_index] in ScoreDiff.ornaments):
-                        
-                        	ornaments2.append(classes[third_index])
-                
-        
-	logging.debug("ornaments1: "+ str(ornaments1))
-	logging.debug("ornaments2: " + str(ornaments2))
-	return ornaments1 == ornaments2    
-    
-    def have_same_pitches(self, msr=0, part=0):
-        """Checks if the two scores both have the same pitches at the specified measure and for the specified part
-	
-	.. note:: This function will compares pitches in the order that they occur.  To compare without considering order, use have_same_pitches_ignore_order.
+                    record = {'part': part, 'measure': msr, 'attribute': attribute}
 
-        
-	Kwargs:
-          msr (int):  the measure number at which to make the comparison
-          
-	  part (int): the part for which to make the comparison
+                    if(detailed):
+                        record['differences'] = _compare_features(attribute, part, msr, msr, features1, features2,
+                                                                  self.index1, self.index2).differences
 
-        Returns:
-          boolean.   The result of the comparison::
+                    yield record
 
-           True -- The scores have the same pitches
-           False -- The scores do not have the same pitches
+    def __check_request__(self, parts, attributes):
+        """Checks and fills in the parts and attributes of a full-score comparison
+
+        Args:
+          parts (iterable): the part numbers to compare, or None for every part both scores share
+
+          attributes (iterable): names from ScoreDiff.attributes to compare, or None for all of them
+
+        Returns:
+          tuple.  (parts, attributes, counts), where parts and attributes are lists, so that they can
+          be gone through again even if they were given as iterators, and counts maps each part to
+          the number of measures both scores have in it
 
         Raises:
           ScoreException
-       
+
         """
+        if(attributes is None):
+            attributes = ScoreDiff.attributes
 
-	self.__verify_part_and_measure__(msr, part)
+        attributes = list(attributes)
 
-        pitches1 = self.score1.parts[part].getElementsByClass('Measure')[msr].flat.notes.pitches
-        pitches2 = self.score2.parts[part].getElementsByClass('Measure')[msr].flat.notes.pitches
-	
-	logging.debug("pitches1: " + str(pitches1))
-	logging.debug("pitches2: " + str(pitches2))
-        return pitches1 == pitches2
+        for attribute in attributes:
+            if(not attribute in ScoreDiff.attributes and not attribute in ScoreDiff.ignore_order_attributes):
+                raise ScoreException("unknown attribute " + str(attribute))
 
+        if(parts is None):
+            parts = range(0, min(self.index1.part_count(), self.index2.part_count()))
 
-    def have_same_pitches_ignore_order(self, msr=0, part=0):
-        """Checks if the two scores both have the same pitches at the specified measure and for the specified part
+        parts = list(parts)
+        counts = {}
 
-        .. note:: This function will determine if the same pitches are present without considering the order in which they appear.
+        for part in parts:
+            self.__verify_part__(part)
+            counts[part] = min(self.index1.measure_count(part), self.index2.measure_count(part))
 
-        Kwargs:
-          msr (int): the measure number at which to make the comparison
+        return (parts, attributes, counts)
 
-	  part (int): the part for which to make the comparison
+    def __diff_range__(self, part, start, stop, attributes):
+        """Compares a range of measures of a part
 
-        Returns:
-          boolean.  The result of the comparison::
+        Args:
+          part (int): the part to examine
 
-	    True -- The scores have the same pitches
-	    False -- The scores do not have the same pitches
+          start (int): the first measure to compare
 
-        Raises:
-	   ScoreException
+          stop (int): the measure after the last one to compare
 
-	"""
+          attributes (list): names from ScoreDiff.attributes to compare
 
-	self.__verify_part_and_measure__(msr, part)
+        Returns:
+          list.  One dict per measure, as in the report of diff_all
 
-	pitches1 = sorted(self.score1.parts[part].getElementsByClass('Measure')[msr].flat.notes.pitches)
-        pitches2 = sorted(self.score2.parts[part].getElementsByClass('Measure')[msr].flat.notes.pitches)
-	logging.debug("pitches1: " + str(pitches1))
-	logging.debug("pitches2: " + str(pitches2))
-        return pitches1 == pitches2
-	
+        """
+        return [self.__compare_measure__(part, msr, msr, attributes) for msr in range(start, stop)]
 
+    def align_measures(self, part=0):
+        """Matches up the measures of a part of both scores, allowing for measures that were inserted or deleted
 
+        Measures are matched on their fingerprints with align_sequences, so an added pickup or
+        repeated bar only shows up where it happened instead of shifting every later measure.
 
-    def have_same_spanners(self, msr=0, part=0):
-        """Checks if the two scores both have the same spanner sites at the specified measure and for the specified part [#f1]_
-	
-	Kwargs:
-          msr (int):  the measure number at which to make the comparison
-          
-	  part (int): the part for which to make the comparison
+        Kwargs:
+          part (int): the part to align
 
         Returns:
-          boolean.   The result of the comparison::
+          list.  (operation, msr1, msr2) tuples in score order, where operation is one of::
 
-           True -- The scores have the same spanners
-           False -- The scores do not have the same spanners
+           'equal' -- measure msr1 of score 1 and msr2 of score 2 have the same features
+           'modify' -- measure msr1 of score 1 was changed into msr2 of score 2
+           'delete' -- measure msr1 of score 1 is missing from score 2 (msr2 is None)
+           'insert' -- measure msr2 of score 2 is missing from score 1 (msr1 is None)
 
         Raises:
           ScoreException
-       
+
         """
+        self.__verify_part__(part)
+
+        return align_sequences(self.index1.fingerprints(part), self.index2.fingerprints(part))
 
-	self.__verify_part_and_measure__(msr, part)
-        
-        notes1 = self.score1.parts[part].getElementsByClass('Measure')[msr].flat.notes
-        notes2 = self.score2.parts[part].getElementsByClass('Measure')[msr].flat.notes
+    def fingerprints(self, part=0):
+        """Gets the fingerprints of every measure of a part of both scores
 
-	spanners1=[]
-	spanners2=[]
+        The fingerprints are plain integers, so whole parts can be compared at once, for instance
+        with numpy.asarray(fingerprints1) != numpy.asarray(fingerprints2).
+
+        Kwargs:
+          part (int): the part to examine
 
-	for index in range(0, len(notes1)):
+        Returns:
+          tuple.  (fingerprints1, fingerprints2), one list per score with one fingerprint per measure
 
-		if(notes1[index].isChord):
+        Raises:
+          ScoreException
 
-			for pitch in notes1[index].pitches:
+        """
+        self.__verify_part__(part)
 
-				spanners1 += pitch.getSpannerSites()
+        return (self.index1.fingerprints(part), self.index2.fingerprints(part))
 
-		else:
+    def changed_measures(self, part=0):
+        """Finds the measures whose fingerprints differ between the two scores
 
-			spanners1 += notes1[index].getSpannerSites()
-	
+        Measures are compared by index, like diff_all; measures that only one score has count as changed.
 
-	for index in range(0, len(notes2)):
-		
-		if(notes2[index].isChord):
+        Kwargs:
+          part (int): the part to examine
 
-			for pitch in notes2[index].pitches:
+        Returns:
+          list.  The measure numbers that differ, in order
 
-				spanners2 += pitch.getSpannerSites()
+        Raises:
+          ScoreException
 
-		else:
+        """
+        fingerprints1, fingerprints2 = self.fingerprints(part)
+        common = min(len(fingerprints1), len(fingerprints2))
+        changed = [msr for msr in range(0, common) if fingerprints1[msr] != fingerprints2[msr]]
 
-			spanners2 += notes2[index].getSpannerSites()
-	
-	logging.debug("spanners1: " + str(spanners1))
-	logging.debug("spanners2: " + str(spanners2))
-        return spanners1 == spanners2
+        return changed + list(range(common, max(len(fingerprints1), len(fingerprints2))))
 
+    def pitch_matches(self, part=0, ignore_order=False):
+        """Compares the pitches of every measure of a part at once, with NumPy
 
-    def have_same_stem_directions(self, msr=0, part=0):
-        """Checks if the two scores both have the same stem directions at the specified measure and for the specified part
+        Each score's pitches are encoded once per part as integers (see ScoreIndex.pitch_codes) and
+        then compared for all measures in a few array operations, which gives the same answers as
+        calling have_same_pitches or have_same_pitches_ignore_order on every measure.  Measures are
+        compared by index, up to the length of the shorter part.  NumPy is only needed for this.
 
         Kwargs:
-          msr (int):  the measure number at which to make the comparison
-          
-	  part (int): the part for which to make the comparison
+          part (int): the part to compare
 
-        Returns:
-          boolean.   The result of the comparison::
+          ignore_order (bool): compare like have_same_pitches_ignore_order instead of have_same_pitches
 
-           True -- The scores have the same stem directions
-           False -- The scores do not have the same stem directions
+        Returns:
+          numpy.ndarray.  One bool per measure, True where the measures have the same pitches
 
         Raises:
           ScoreException
-       
+
         """
+        self.__verify_part__(part)
 
-	self.__verify_part_and_measure__(msr, part)
+        codes1, bounds1 = self.index1.pitch_codes(part)
+        codes2, bounds2 = self.index2.pitch_codes(part)
 
-        notes1 = self.score1.parts[part].getElementsByClass('Measure')[msr].flat.notes
-        notes2 = self.score2.parts[part].getElementsByClass('Measure')[msr].flat.notes
+        return _pitch_matches(codes1, bounds1, codes2, bounds2, ignore_order)
 
-        stems1=[]
-	stems2=[]
-        
-	for index in range(0, len(notes1)):
+    def have_same_part_pitches(self, part=0, ignore_order=False):
+        """Checks if a whole part has the same pitches in both scores, regardless of where the barlines fall
+
+        Kwargs:
+          part (int): the part to compare
 
-		if(notes1[index].isChord):
+          ignore_order (bool): only check that the same pitches occur as often, in any order
 
-			for pitch in notes1[index].pitches:
+        Returns:
+          boolean.   The result of the comparison::
 
-				stems1+=[notes1[index].getStemDirection(pitch)]
+            True -- The parts have the same pitches
+            False -- The parts do not have the same pitches
 
-			stems1 = list(set(stems1))
-			
-		else:
+        Raises:
+          ScoreException
 
-			stems1+=[notes1[index].stemDirection]
-	
-	for index in range(0, len(notes2)):
-			
-		if(notes2[index].isChord):
+        """
+        numpy = _numpy()
+        self.__verify_part__(part)
 
-			for pitch in notes2[index].pitches:
+        codes1 = self.index1.pitch_codes(part)[0]
+        codes2 = self.index2.pitch_codes(part)[0]
 
-				stems2+=[notes2[index].getStemDirection(pitch)]
+        if(ignore_order):
+            codes1 = numpy.sort(codes1)
+            codes2 = numpy.sort(codes2)
 
-			stems2 = list(set(stems2))
+        return bool(numpy.array_equal(codes1, codes2))
 
-		else:
+    def have_same_part_spanners(self, part=0, detailed=False):
+        """Checks if a whole part has the same spanners in both scores, covering the same measures
 
-			stems2+=[notes2[index].stemDirection]
-	
-	logging.debug("stems1: " + str(stems1))
-	logging.debug("stems2: " + str(stems2))
-        return stems1 == stems2
-      
-   	
-    def have_same_time_signature(self, msr=0, part=0):
-        """Checks if the two scores both have the same time signature at the specified measure and for the specified part
+        have_same_spanners compares the spanners attached to the notes of one measure, so a slur
+        across a barline is seen once in every measure it touches.  Here every spanner of the part
+        is compared once, together with the first and last measure it covers, from the spanner
+        index built once per part (see ScoreIndex.spanner_ranges).
 
         Kwargs:
-          msr (int):  the measure number at which to make the comparison
-          
-	  part (int): the part for which to make the comparison
+          part (int): the part to compare
+
+          detailed (bool): return a ComparisonResult listing the differences instead of a boolean;
+          the differences give each spanner as (class name, first measure, last measure) and its
+          first measure as the offset
 
         Returns:
           boolean.   The result of the comparison::
 
-           True -- The scores have the same time signature
-           False -- The scores do not have the same time signature
+            True -- The parts have the same spanners
+            False -- The parts do not have the same spanners
+
+          ComparisonResult if detailed is True, with msr1 and msr2 set to None
 
         Raises:
           ScoreException
-       
-        """
-
-	self.__verify_part_and_measure__(msr, part)
-	measures1 = self.score1.parts[part].getElementsByClass('Measure')
-	measures2 = self.score2.parts[part].getElementsByClass('Measure')
-        time_signature1 = measures1[msr].timeSignature
-        time_signature2 = measures2[msr].timeSignature
-	
-	if(time_signature1 == None):
-
-		current = self.__get_most_recent_time__(msr, part ,1)
-		time_signature1 = self.score1.parts[part].measure(current).timeSignature
-	
-	if(time_signature2 == None):
-		
-		current = self.__get_most_recent_time__(msr, part, 2)
-		time_signature2 = self.score2.parts[part].measure(current).timeSignature
-	
-	numerator1 = time_signature1.numerator
-        numerator2 = time_signature2.numerator
-        denominator1 = time_signature1.denominator
-        denominator2 = time_signature2.denominator
-	
-	logging.debug("time signature1: "+str(numerator1) +"/"+str(denominator1))
-	logging.debug("time signature2: "+str(numerator2) +"/"+str(denominator2))
-        return numerator1 == numerator2 and denominator1 == denominator2 
 
+        """
+        self.__verify_part__(part)
 
-    def __get_most_recent_time__(self, msr=0, part=0, score_number=1):
-        """Gets the measure number of the most recent time signature change
-	
-	Kwargs:
-	  msr (int): measure number that is used to determine what is considered the most recent time change
+        ranges1 = self.index1.spanner_ranges(part)
+        ranges2 = self.index2.spanner_ranges(part)
+
+        logger.debug("spanner ranges1: %s", ranges1)
+        logger.debug("spanner ranges2: %s", ranges2)
 
-	  part (int): the part to examine
+        if(detailed):
+            return ComparisonResult('part_spanners', part, None, None,
+                                    _differences(ranges1, [entry[1] for entry in ranges1],
+                                                 ranges2, [entry[1] for entry in ranges2]))
 
-	  score_number (int): A score number so the function knows which score to analyze
+        return ranges1 == ranges2
 
-	Returns:
-	  int:  the measure number of the most recent time signature change
+    def diff_aligned(self, part=0, attributes=None):
+        """Compares a part of both scores measure by measure after aligning them with align_measures
 
+        Kwargs:
+          part (int): the part to compare
+
+          attributes (list): names from ScoreDiff.attributes to compare, defaults to all of them
+
+        Returns:
+          list.  (operation, msr1, msr2, results) tuples, where results maps each attribute name to
+          the result of comparing the two measures of a 'modify' and is None for every other operation
 
-	"""
-	if(score_number == 1):
+        Raises:
+          ScoreException
 
-		times = self.score1.parts[part].flat.getTimeSignatures()
-		target_measure = self.score1.parts[part].getElementsByClass('Measure')[msr].measureNumber
+        """
+        if(attributes is None):
+            attributes = ScoreDiff.attributes
 
-	elif(score_number == 2):
+        report = []
 
-		times = self.score2.parts[part].flat.getTimeSignatures()
-		target_measure = self.score2.parts[part].getElementsByClass('Measure')[msr].measureNumber
+        for operation, msr1, msr2 in self.align_measures(part):
 
-	current = 0
+            results = None
 
-	for time in times:
+            if(operation == 'modify'):
+                results = self.__compare_measure__(part, msr1, msr2, attributes)
 
-		if(time.measureNumber > current and time.measureNumber <= target_measure):
+            report.append((operation, msr1, msr2, results))
 
-			current = time.measureNumber
-	
-	logging.debug("most recent time found: "+str(current))
-	return current
+        return report
 
-              
-    def __verify_part_and_measure__(self, msr, part):
-        """Checks to make sure the part and measure numbers a user has entered are not outside of the range that exists for either score
+    def __compare_measure__(self, part, msr1, msr2, attributes):
+        """Compares the extracted features of a measure of score 1 with a measure of score 2
 
         Args:
-          part (int): The part number to check
+          part (int): the part to examine
 
-	  msr (int): The measure number to check
+          msr1 (int): the measure of score 1
 
-        Raises:
-          ScoreException
+          msr2 (int): the measure of score 2
+
+          attributes (list): names from ScoreDiff.attributes to compare
+
+        Returns:
+          dict.  Maps each attribute name to the result of the comparison
 
         """
-	self.__verify_part__(part)
+        features1 = self.index1.features(part, msr1)
+        features2 = self.index2.features(part, msr2)
 
-	if (msr >= len(self.score1.parts[part].getElementsByClass('Measure').elements) or msr < 0):
+        #measures with the same fingerprint are the same on every attribute
+        if(features1.fingerprint() == features2.fingerprint()):
+            return dict((attribute, True) for attribute in attributes)
 
-		raise ScoreException("measure number "+str(msr) + "does not exist for "+self.name1)
-	
-	if (msr >= len(self.score2.parts[part].getElementsByClass('Measure').elements) or msr < 0):
-		
-		raise ScoreException("measure number "+str(msr) + "does not exist for "+self.name2)
+        return dict((attribute, features1.value(attribute) == features2.value(attribute))
+                    for attribute in attributes)
 
+    def __compare_detailed__(self, attribute, part, msr1, msr2):
+        """Compares one attribute of a measure of score 1 with a measure of score 2 and lists the differences
 
-    def __verify_part__(self, part):
-        """Checks to make sure the part number a user has entered is not outside the range that exists for either score
+        Args:
+          attribute (str): a name from ScoreDiff.attributes
+
+          part (int): the part to examine
+
+          msr1 (int): the measure of score 1
 
-	Args:
-	  part (int): The part number to check
+          msr2 (int): the measure of score 2
 
-	Raises:
-	  ScoreException
+        Returns:
+          ComparisonResult
 
-	"""
-	if (part >= len(self.score1.parts) or part < 0):
+        """
+        result = _compare_features(attribute, part, msr1, msr2, self.index1.features(part, msr1),
+                                   self.index2.features(part, msr2), self.index1, self.index2)
 
-        	raise ScoreException("part number " + str(part) + " does not exist for " + self.name1)
+        logger.debug("%s differences: %s", attribute, result.differences)
+        return result
 
-        if (part >= len(self.score2.parts) or part < 0):
+    def __get_index__(self, score_number):
+        """Gets the measure index of one of the two parsed scores
 
-        	raise ScoreException("part number " + str(part) + " does not exist for " + self.name2)
+        Args:
+          score_number (int): 1 or 2
 
+        Returns:
+          ScoreIndex
 
-class ScoreException(Exception):
-	"""Class for handling exceptions while using the ScoreDiff tool
+        """
+        if(score_number == 1):
+            return self.index1
 
+        return self.index2
 
-	"""
-        def __init__(self , value):
-		"""Initializes the ScoreException object
+    def have_same_accidentals(self, msr=0, part=0, detailed=False):
+        """Checks if the two scores both have the same accidentals at the specified measure and for the specified part
 
-		Args:
-		 value (str): An error message
+        Kwargs:
+          msr (int):  the measure number at which to make the comparison
 
-		"""
-		self.value = value
+          part (int): the part for which to make the comparison
 
-	def __str__(self):
-		"""Function for fetching this object's error message
-		Returns:
-		 This object's error message
+          detailed (bool): return a ComparisonResult listing the differences instead of a boolean
 
-		"""
-		return repr(self.value)
+        Returns:
+           boolean.   The result of the comparison::
 
-"""
+            True -- The scores have the same accidentals
+            False -- The scores do not have the same accidentals
 
-.. rubric:: Footnotes
+            A ComparisonResult with the same truth value when detailed is True
 
-.. [#f2] http://mit.edu/music21/doc/html/moduleArticulations.html?highlight=articulation#music21.articulations
+        Raises:
+          ScoreException
 
-.. [#f1] http://mit.edu/music21/doc/html/moduleSpanner.html
+        """
+        self.__verify_part_and_measure__(msr, part)
 
-"""
+        if(detailed):
+            return self.__compare_detailed__('accidentals', part, msr, msr)
+
+        accidentals1 = self.index1.features(part, msr).accidentals
+        accidentals2 = self.index2.features(part, msr).accidentals
+
+        logger.debug("accidentals1: %s", accidentals1)
+        logger.debug("accidentals2: %s", accidentals2)
+        return accidentals1 == accidentals2
+
+    def __get_most_recent_key__(self, msr=0, part=0, score_number=1):
+        """Gets the measure number of the most recent key change
+
+        Kwargs:
+          msr (int): measure number that is used to determine what is considered the most recent key change
+
+          part (int): the part to examine
+
+          score_number (int): A score number so the function knows which score to analyze
+
+        Returns:
+          int:  the measure number of the most recent key change
+
+        """
+        current = self.__get_index__(score_number).most_recent_change(part, msr, 'key')
+
+        logger.debug("most recent key was: %s", current)
+        return current
+
+    def have_same_articulations(self, msr=0, part=0, detailed=False):
+        """Checks if the two scores both have the same articulations at the specified measure and for the specified part [#f2]_
+
+        Kwargs:
+          msr (int):  the measure number at which to make the comparison
+
+          part (int): the part for which to make the comparison
+
+          detailed (bool): return a ComparisonResult listing the differences instead of a boolean
+
+        Returns:
+          boolean.   The result of the comparison::
+
+           True -- The scores have the same articulations
+           False -- The scores do not have the same articulations
+
+           A ComparisonResult with the same truth value when detailed is True
+
+        Raises:
+          ScoreException
+
+
+        """
+
+        self.__verify_part_and_measure__(msr, part)
+
+        if(detailed):
+            return self.__compare_detailed__('articulations', part, msr, msr)
+
+        articulations1 = self.index1.features(part, msr).articulations
+        articulations2 = self.index2.features(part, msr).articulations
+
+        logger.debug("articulations1: %s", articulations1)
+        logger.debug("articulations2: %s", articulations2)
+        return articulations1 == articulations2
+
+    def have_same_clef_markings(self, msr=0, part=0, detailed=False):
+        """Checks if the two scores both have the same clef markings at the specified measure and for the specified part
+
+        Kwargs:
+          msr (int):  the measure number at which to make the comparison
+
+          part (int): the part for which to make the comparison
+
+          detailed (bool): return a ComparisonResult listing the differences instead of a boolean
+
+        Returns:
+          boolean.   The result of the comparison::
+
+           True -- The scores have the same clef markings
+           False -- The scores do not have the same clef markings
+
+           A ComparisonResult with the same truth value when detailed is True
+
+        Raises:
+          ScoreException
+
+        """
+        self.__verify_part_and_measure__(msr, part)
+
+        if(detailed):
+            return self.__compare_detailed__('clef_markings', part, msr, msr)
+
+        clef1 = self.index1.features(part, msr).clef_markings
+        clef2 = self.index2.features(part, msr).clef_markings
+
+        logger.debug("clef1.sign: %s", clef1)
+        logger.debug("clef2.sign: %s", clef2)
+        return clef1 == clef2
+
+    def __get_most_recent_clef__(self, msr=0, part=0, score_number=1):
+        """Gets the measure number of the most recent clef change
+
+        Kwargs:
+          msr (int):  the measure number of the most recent clef change
+
+          part (int): the part to examine
+
+          score_number (int): A score number so the function knows which score to analyze
+
+        Returns:
+          int.  The measure number of the most recent clef change
+
+        """
+        current = self.__get_index__(score_number).most_recent_change(part, msr, 'clef')
+
+        logger.debug("most recent clef found: %s", current)
+        return current
+
+
+
+    def have_same_key_signature(self, msr=0, part=0, detailed=False):
+        """Checks if the two scores both have the same key signature at the specified measure and for the specified part
+
+        Kwargs:
+          msr (int):  the measure number at which to make the comparison
+
+          part (int): the part for which to make the comparison
+
+          detailed (bool): return a ComparisonResult listing the differences instead of a boolean
+
+        Returns:
+          boolean.   The result of the comparison::
+
+           True -- The scores have the same key
+           False -- The scores do not have the same key
+
+           A ComparisonResult with the same truth value when detailed is True
+
+        Raises:
+          ScoreException
+
+
+        """
+        self.__verify_part_and_measure__(msr, part)
+
+        if(detailed):
+            return self.__compare_detailed__('key_signature', part, msr, msr)
+
+        key_signature1 = self.index1.features(part, msr).key_signature
+        key_signature2 = self.index2.features(part, msr).key_signature
+
+        logger.debug("key signature 1.sharps: %s", key_signature1)
+        logger.debug("key signature 2.sharps: %s", key_signature2)
+        return key_signature1 == key_signature2
+
+
+    def have_same_ornaments(self, msr=0, part=0, detailed=False):
+        """Checks if the two scores both have the same ornaments at the specified measure and for the specified part
+
+        Kwargs:
+          msr (int):  the measure number at which to make the comparison
+
+          part (int): the part for which to make the comparison
+
+          detailed (bool): return a ComparisonResult listing the differences instead of a boolean
+
+        Returns:
+          boolean.   The result of the comparison::
+
+           True -- The scores have the same ornaments
+           False -- The scores do not have the same ornaments
+
+           A ComparisonResult with the same truth value when detailed is True
+
+        Raises:
+          ScoreException
+
+        """
+
+        self.__verify_part_and_measure__(msr, part)
+
+        if(detailed):
+            return self.__compare_detailed__('ornaments', part, msr, msr)
+
+        ornaments1 = self.index1.features(part, msr).ornaments
+        ornaments2 = self.index2.features(part, msr).ornaments
+
+        logger.debug("ornaments1: %s", ornaments1)
+        logger.debug("ornaments2: %s", ornaments2)
+        return ornaments1 == ornaments2
+
+    def have_same_pitches(self, msr=0, part=0, detailed=False):
+        """Checks if the two scores both have the same pitches at the specified measure and for the specified part
+
+        .. note:: This function will compares pitches in the order that they occur.  To compare without considering order, use have_same_pitches_ignore_order.
+
+
+        Kwargs:
+          msr (int):  the measure number at which to make the comparison
+
+          part (int): the part for which to make the comparison
+
+          detailed (bool): return a ComparisonResult listing the differences instead of a boolean
+
+        Returns:
+          boolean.   The result of the comparison::
+
+           True -- The scores have the same pitches
+           False -- The scores do not have the same pitches
+
+           A ComparisonResult with the same truth value when detailed is True
+
+        Raises:
+          ScoreException
+
+        """
+
+        self.__verify_part_and_measure__(msr, part)
+
+        if(detailed):
+            return self.__compare_detailed__('pitches', part, msr, msr)
+
+        pitches1 = self.index1.features(part, msr).pitches
+        pitches2 = self.index2.features(part, msr).pitches
+
+        logger.debug("pitches1: %s", pitches1)
+        logger.debug("pitches2: %s", pitches2)
+        return pitches1 == pitches2
+
+
+    def have_same_pitches_ignore_order(self, msr=0, part=0, detailed=False):
+        """Checks if the two scores both have the same pitches at the specified measure and for the specified part
+
+        .. note:: This function will determine if the same pitches are present without considering the order in which they appear.
+
+        Kwargs:
+          msr (int): the measure number at which to make the comparison
+
+          part (int): the part for which to make the comparison
+
+          detailed (bool): return a ComparisonResult listing the differences instead of a boolean
+
+        Returns:
+          boolean.  The result of the comparison::
+
+            True -- The scores have the same pitches
+            False -- The scores do not have the same pitches
+
+            A ComparisonResult with the same truth value when detailed is True
+
+        Raises:
+           ScoreException
+
+        """
+
+        self.__verify_part_and_measure__(msr, part)
+
+        if(detailed):
+            return self.__compare_detailed__('pitches_ignore_order', part, msr, msr)
+
+        pitches1 = self.index1.features(part, msr).value('pitches_ignore_order')
+        pitches2 = self.index2.features(part, msr).value('pitches_ignore_order')
+        logger.debug("pitches1: %s", pitches1)
+        logger.debug("pitches2: %s", pitches2)
+        return pitches1 == pitches2
+
+
+
+
+    def have_same_accidentals_ignore_order(self, msr=0, part=0, detailed=False):
+        """Checks if the two scores both have the same accidentals at the specified measure and for the specified part, in any order
+
+        .. note:: This function counts how often each of the accidentals occurs, without considering the order in which they appear.  To compare a range of measures or a whole part, use have_same_ignore_order.
+
+        Kwargs:
+          msr (int): the measure number at which to make the comparison
+
+          part (int): the part for which to make the comparison
+
+          detailed (bool): return a ComparisonResult listing the differences instead of a boolean
+
+        Returns:
+          boolean.  The result of the comparison::
+
+            True -- The scores have the same accidentals
+            False -- The scores do not have the same accidentals
+
+            A ComparisonResult with the same truth value when detailed is True
+
+        Raises:
+           ScoreException
+
+        """
+        self.__verify_part_and_measure__(msr, part)
+
+        if(detailed):
+            return self.__compare_detailed__('accidentals_ignore_order', part, msr, msr)
+
+        accidentals1 = self.index1.features(part, msr).value('accidentals_ignore_order')
+        accidentals2 = self.index2.features(part, msr).value('accidentals_ignore_order')
+
+        logger.debug("accidentals1: %s", accidentals1)
+        logger.debug("accidentals2: %s", accidentals2)
+        return accidentals1 == accidentals2
+
+    def have_same_articulations_ignore_order(self, msr=0, part=0, detailed=False):
+        """Checks if the two scores both have the same articulations at the specified measure and for the specified part, in any order
+
+        .. note:: This function counts how often each of the articulations occurs, without considering the order in which they appear.  To compare a range of measures or a whole part, use have_same_ignore_order.
+
+        Kwargs:
+          msr (int): the measure number at which to make the comparison
+
+          part (int): the part for which to make the comparison
+
+          detailed (bool): return a ComparisonResult listing the differences instead of a boolean
+
+        Returns:
+          boolean.  The result of the comparison::
+
+            True -- The scores have the same articulations
+            False -- The scores do not have the same articulations
+
+            A ComparisonResult with the same truth value when detailed is True
+
+        Raises:
+           ScoreException
+
+        """
+        self.__verify_part_and_measure__(msr, part)
+
+        if(detailed):
+            return self.__compare_detailed__('articulations_ignore_order', part, msr, msr)
+
+        articulations1 = self.index1.features(part, msr).value('articulations_ignore_order')
+        articulations2 = self.index2.features(part, msr).value('articulations_ignore_order')
+
+        logger.debug("articulations1: %s", articulations1)
+        logger.debug("articulations2: %s", articulations2)
+        return articulations1 == articulations2
+
+    def have_same_ornaments_ignore_order(self, msr=0, part=0, detailed=False):
+        """Checks if the two scores both have the same ornaments at the specified measure and for the specified part, in any order
+
+        .. note:: This function counts how often each of the ornaments occurs, without considering the order in which they appear.  To compare a range of measures or a whole part, use have_same_ignore_order.
+
+        Kwargs:
+          msr (int): the measure number at which to make the comparison
+
+          part (int): the part for which to make the comparison
+
+          detailed (bool): return a ComparisonResult listing the differences instead of a boolean
+
+        Returns:
+          boolean.  The result of the comparison::
+
+            True -- The scores have the same ornaments
+            False -- The scores do not have the same ornaments
+
+            A ComparisonResult with the same truth value when detailed is True
+
+        Raises:
+           ScoreException
+
+        """
+        self.__verify_part_and_measure__(msr, part)
+
+        if(detailed):
+            return self.__compare_detailed__('ornaments_ignore_order', part, msr, msr)
+
+        ornaments1 = self.index1.features(part, msr).value('ornaments_ignore_order')
+        ornaments2 = self.index2.features(part, msr).value('ornaments_ignore_order')
+
+        logger.debug("ornaments1: %s", ornaments1)
+        logger.debug("ornaments2: %s", ornaments2)
+        return ornaments1 == ornaments2
+
+    def have_same_spanners_ignore_order(self, msr=0, part=0, detailed=False):
+        """Checks if the two scores both have the same spanner sites at the specified measure and for the specified part, in any order
+
+        .. note:: This function counts how often each of the spanner sites occurs, without considering the order in which they appear.  To compare a range of measures or a whole part, use have_same_ignore_order.
+
+        Kwargs:
+          msr (int): the measure number at which to make the comparison
+
+          part (int): the part for which to make the comparison
+
+          detailed (bool): return a ComparisonResult listing the differences instead of a boolean
+
+        Returns:
+          boolean.  The result of the comparison::
+
+            True -- The scores have the same spanner sites
+            False -- The scores do not have the same spanner sites
+
+            A ComparisonResult with the same truth value when detailed is True
+
+        Raises:
+           ScoreException
+
+        """
+        self.__verify_part_and_measure__(msr, part)
+
+        if(detailed):
+            return self.__compare_detailed__('spanners_ignore_order', part, msr, msr)
+
+        spanners1 = self.index1.features(part, msr).value('spanners_ignore_order')
+        spanners2 = self.index2.features(part, msr).value('spanners_ignore_order')
+
+        logger.debug("spanners1: %s", spanners1)
+        logger.debug("spanners2: %s", spanners2)
+        return spanners1 == spanners2
+
+    def have_same_ignore_order(self, attribute, part=0, start=0, stop=None):
+        """Checks if a range of measures, or a whole part, has the same values of an attribute in both scores, in any order
+
+        The values of every measure in the range are counted into one multiset per score, in time
+        linear in the number of values, so a value that moved to another measure of the range
+        still matches.
+
+        Args:
+          attribute (str): the field to count: 'accidentals', 'articulations', 'ornaments', 'pitches' or 'spanners'
+
+        Kwargs:
+          part (int): the part for which to make the comparison
+
+          start (int): the first measure of the range
+
+          stop (int): the measure after the last one of the range, defaults to the end of the part in each score
+
+        Returns:
+          boolean.  The result of the comparison::
+
+            True -- The scores have the same values in the range
+            False -- The scores do not have the same values in the range
+
+        Raises:
+          ScoreException
+
+        """
+        if(not attribute + '_ignore_order' in ScoreDiff.attributes + ScoreDiff.ignore_order_attributes):
+            raise ScoreException("cannot compare " + str(attribute) + " without regard to order")
+
+        self.__verify_part__(part)
+
+        counts1 = self.index1.counts(part, attribute, start, stop)
+        counts2 = self.index2.counts(part, attribute, start, stop)
+
+        logger.debug("%s counts1: %s", attribute, counts1)
+        logger.debug("%s counts2: %s", attribute, counts2)
+        return counts1 == counts2
+
+    def have_same_spanners(self, msr=0, part=0, detailed=False):
+        """Checks if the two scores both have the same spanner sites at the specified measure and for the specified part [#f1]_
+
+        Kwargs:
+          msr (int):  the measure number at which to make the comparison
+
+          part (int): the part for which to make the comparison
+
+          detailed (bool): return a ComparisonResult listing the differences instead of a boolean
+
+        Returns:
+          boolean.   The result of the comparison::
+
+           True -- The scores have the same spanners
+           False -- The scores do not have the same spanners
+
+           A ComparisonResult with the same truth value when detailed is True
+
+        Raises:
+          ScoreException
+
+        """
+
+        self.__verify_part_and_measure__(msr, part)
+
+        if(detailed):
+            return self.__compare_detailed__('spanners', part, msr, msr)
+
+        spanners1 = self.index1.features(part, msr).spanners
+        spanners2 = self.index2.features(part, msr).spanners
+
+        logger.debug("spanners1: %s", spanners1)
+        logger.debug("spanners2: %s", spanners2)
+        return spanners1 == spanners2
+
+    def have_same_stem_directions(self, msr=0, part=0, detailed=False):
+        """Checks if the two scores both have the same stem directions at the specified measure and for the specified part
+
+        Kwargs:
+          msr (int):  the measure number at which to make the comparison
+
+          part (int): the part for which to make the comparison
+
+          detailed (bool): return a ComparisonResult listing the differences instead of a boolean
+
+        Returns:
+          boolean.   The result of the comparison::
+
+           True -- The scores have the same stem directions
+           False -- The scores do not have the same stem directions
+
+           A ComparisonResult with the same truth value when detailed is True
+
+        Raises:
+          ScoreException
+
+        """
+
+        self.__verify_part_and_measure__(msr, part)
+
+        if(detailed):
+            return self.__compare_detailed__('stem_directions', part, msr, msr)
+
+        stems1 = self.index1.features(part, msr).stem_directions
+        stems2 = self.index2.features(part, msr).stem_directions
+
+        logger.debug("stems1: %s", stems1)
+        logger.debug("stems2: %s", stems2)
+        return stems1 == stems2
+
+    def have_same_time_signature(self, msr=0, part=0, detailed=False):
+        """Checks if the two scores both have the same time signature at the specified measure and for the specified part
+
+        Kwargs:
+          msr (int):  the measure number at which to make the comparison
+
+          part (int): the part for which to make the comparison
+
+          detailed (bool): return a ComparisonResult listing the differences instead of a boolean
+
+        Returns:
+          boolean.   The result of the comparison::
+
+           True -- The scores have the same time signature
+           False -- The scores do not have the same time signature
+
+           A ComparisonResult with the same truth value when detailed is True
+
+        Raises:
+          ScoreException
+
+        """
+
+        self.__verify_part_and_measure__(msr, part)
+
+        if(detailed):
+            return self.__compare_detailed__('time_signature', part, msr, msr)
+
+        time_signature1 = self.index1.features(part, msr).time_signature
+        time_signature2 = self.index2.features(part, msr).time_signature
+
+        logger.debug("time signature1: %s", time_signature1)
+        logger.debug("time signature2: %s", time_signature2)
+        return time_signature1 == time_signature2
+
+    def __get_most_recent_time__(self, msr=0, part=0, score_number=1):
+        """Gets the measure number of the most recent time signature change
+
+        Kwargs:
+          msr (int): measure number that is used to determine what is considered the most recent time change
+
+          part (int): the part to examine
+
+          score_number (int): A score number so the function knows which score to analyze
+
+        Returns:
+          int:  the measure number of the most recent time signature change
+
+
+        """
+        current = self.__get_index__(score_number).most_recent_change(part, msr, 'time')
+
+        logger.debug("most recent time found: %s", current)
+        return current
+
+
+    def __verify_part_and_measure__(self, msr, part):
+        """Checks to make sure the part and measure numbers a user has entered are not outside of the range that exists for either score
+
+        Args:
+          part (int): The part number to check
+
+          msr (int): The measure number to check
+
+        Raises:
+          ScoreException
+
+        """
+        self.__verify_part__(part)
+
+        if (msr >= self.index1.measure_count(part) or msr < 0):
+
+                raise ScoreException("measure number "+str(msr) + "does not exist for "+self.name1)
+
+        if (msr >= self.index2.measure_count(part) or msr < 0):
+
+                raise ScoreException("measure number "+str(msr) + "does not exist for "+self.name2)
+
+
+    def __verify_part__(self, part):
+        """Checks to make sure the part number a user has entered is not outside the range that exists for either score
+
+        Args:
+          part (int): The part number to check
+
+        Raises:
+          ScoreException
+
+        """
+        if (part >= self.index1.part_count() or part < 0):
+
+                raise ScoreException("part number " + str(part) + " does not exist for " + self.name1)
+
+        if (part >= self.index2.part_count() or part < 0):
+
+                raise ScoreException("part number " + str(part) + " does not exist for " + self.name2)
+
+
+class ParseCache:
+    """A cache of parsed scores keyed by file path and content
+
+    Parsed scores are kept in memory, least recently used first out, and can also be written
+    to a directory as serialized music21 streams so that later runs never re-parse the
+    MusicXML of a file that has not changed.  Editing a file changes its key, so stale
+    entries are never returned.
+
+    """
+
+    def __init__(self, maxsize=16, directory=None):
+        """Initializes a ParseCache object.
+
+        Kwargs:
+         maxsize (int):  How many parsed scores to keep in memory
+
+         directory (str):  A directory for serialized scores, or None to only cache in memory
+
+        """
+        self.maxsize = maxsize
+        self.directory = directory
+        self._scores = OrderedDict()
+
+        if(not directory is None and not os.path.isdir(directory)):
+            os.makedirs(directory)
+
+    def key(self, path):
+        """Computes the cache key of a score file
+
+        Args:
+          path (str): The pathname of the score
+
+        Returns:
+          str.  A digest of the absolute path and the contents of the file
+
+        """
+        import hashlib
+
+        digest = hashlib.sha1(os.path.abspath(path).encode('utf-8'))
+
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                digest.update(chunk)
+
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Looks up a parsed score, trying memory first and then the directory
+
+        Args:
+          key (str): A key from ParseCache.key
+
+        Returns:
+          music21.stream.Score.  The cached score, or None if it has not been cached
+
+        """
+        score = self._scores.pop(key, None)
+
+        if(score is None and not self.directory is None):
+            score = self.__load__(key)
+
+        if(not score is None):
+            self.__remember__(key, score)
+
+        return score
+
+    def put(self, key, score):
+        """Adds a parsed score to the cache
+
+        Args:
+          key (str): A key from ParseCache.key
+
+          score (music21.stream.Score): The parsed score
+
+        """
+        self.__remember__(key, score)
+
+        if(not self.directory is None):
+            self.__store__(key, score)
+
+    def __len__(self):
+        """Counts the scores held in memory"""
+        return len(self._scores)
+
+    def clear(self):
+        """Empties the in-memory tier of the cache, keeping any serialized scores in the directory
+
+        """
+        self._scores.clear()
+
+    def __remember__(self, key, score):
+        """Adds a score to the in-memory tier as its most recently used entry, evicting the oldest if needed
+
+        Args:
+          key (str): A key from ParseCache.key
+
+          score (music21.stream.Score): The parsed score
+
+        """
+        self._scores.pop(key, None)
+        self._scores[key] = score
+
+        while(len(self._scores) > self.maxsize):
+            self._scores.popitem(last=False)
+
+    def __cache_file__(self, key):
+        """Gets the file a serialized score is stored in
+
+        Args:
+          key (str): A key from ParseCache.key
+
+        Returns:
+          str.  The pathname of the file
+
+        """
+        return os.path.join(self.directory, key + '.p')
+
+    def __load__(self, key):
+        """Reads a serialized score from the directory
+
+        Args:
+          key (str): A key from ParseCache.key
+
+        Returns:
+          music21.stream.Score.  The score, or None if it is missing or unreadable
+
+        """
+        path = self.__cache_file__(key)
+
+        if(not os.path.isfile(path)):
+            return None
+
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            thawer = _music21('freezeThaw').StreamThawer()
+            thawer.openStr(data)
+            return thawer.stream
+
+        except Exception:
+            logger.debug("could not read cached score %s", path)
+            return None
+
+    def __store__(self, key, score):
+        """Serializes a score into the directory, replacing any previous file atomically
+
+        Args:
+          key (str): A key from ParseCache.key
+
+          score (music21.stream.Score): The parsed score
+
+        """
+        data = _music21('freezeThaw').StreamFreezer(score).writeStr(fmt='pickle')
+        import tempfile
+
+        handle, temporary = tempfile.mkstemp(dir=self.directory)
+
+        with os.fdopen(handle, 'wb') as f:
+            f.write(data)
+
+        os.rename(temporary, self.__cache_file__(key))
+
+
+class MeasureFeatures(object):
+    """The values ScoreDiff compares for one measure of one part, detached from music21
+
+    Every field holds plain strings, numbers or tuples of them, so a MeasureFeatures object is
+    small, cheap to compare and can be pickled or kept after the parsed score is released::
+
+      accidentals -- names of the accidentals not implied by the key signature, e.g. ('sharp',)
+      articulations -- music21 class names of the articulations, e.g. ('Staccato', 'Accent')
+      clef_markings -- the sign of the clef in effect, e.g. 'G'
+      key_signature -- the number of sharps (negative for flats) of the key signature in effect
+      ornaments -- music21 class names of the ornaments, e.g. ('Trill',)
+      pitches -- names with octave of the pitches in the order they occur, e.g. ('C#4', 'E4')
+      spanners -- music21 class names of the spanners attached to the notes, e.g. ('Slur',)
+      stem_directions -- the stem directions, e.g. ('up', 'down')
+      time_signature -- the (numerator, denominator) of the time signature in effect
+
+    The key, clef and time signature fields are None when no marking was found.  Where in the
+    measure each entry came from is not kept; see ScoreIndex.positions.
+
+    """
+
+    #The compared fields, in the order they are hashed and pickled
+    fields = ('accidentals', 'articulations', 'clef_markings', 'key_signature', 'ornaments',
+              'pitches', 'spanners', 'stem_directions', 'time_signature')
+
+    __slots__ = fields + ('_fingerprint',)
+
+    def __init__(self):
+        """Initializes an empty MeasureFeatures object; ScoreIndex fills in the fields
+
+        """
+        self._fingerprint = None
+
+    def value(self, attribute):
+        """Gets the value that is compared for one of ScoreDiff.attributes
+
+        Args:
+          attribute (str): a name from ScoreDiff.attributes
+
+        Returns:
+          The field of the same name, or for a name ending in _ignore_order a Counter of the
+          values of the field it starts with
+
+        """
+        if(attribute.endswith('_ignore_order')):
+            return Counter(getattr(self, attribute[:-len('_ignore_order')]))
+
+        return getattr(self, attribute)
+
+    def __eq__(self, other):
+        """Two MeasureFeatures are equal when every field is equal"""
+        if(not isinstance(other, MeasureFeatures)):
+            return False
+
+        for name in MeasureFeatures.fields:
+
+            if(getattr(self, name) != getattr(other, name)):
+
+                return False
+
+        return True
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def fingerprint(self):
+        """Gets a 64 bit hash of every field, which is the same in every process and every run
+
+        The hash covers the pitches, accidentals, articulations, ornaments, stems and spanners of
+        the measure as well as the key, clef and time signature in effect, so two measures with
+        the same fingerprint compare equal on every attribute.  It is computed once and kept.
+
+        Returns:
+          int
+
+        """
+        if(self._fingerprint is None):
+            import hashlib
+
+            compared = tuple(getattr(self, name) for name in MeasureFeatures.fields)
+            digest = hashlib.md5(repr(compared).encode('utf-8')).digest()
+            self._fingerprint = struct.unpack('<q', digest[:8])[0]
+
+        return self._fingerprint
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in MeasureFeatures.fields)
+
+    def __setstate__(self, state):
+        self._fingerprint = None
+
+        for name, value in zip(MeasureFeatures.fields, state):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return 'MeasureFeatures(' + ', '.join(name + '=' + repr(getattr(self, name))
+                                              for name in MeasureFeatures.fields) + ')'
+
+
+#One difference found by a detailed comparison.  operation is 'modify', 'delete' or 'insert'; the
+#offset and value of the side an element is missing from are None, and so are the offsets of the
+#key signature, clef and time signature, which belong to the whole measure
+Difference = namedtuple('Difference', ['operation', 'offset1', 'value1', 'offset2', 'value2'])
+
+
+class ComparisonResult(object):
+    """The outcome of comparing one attribute of a measure of each score, with the differences found
+
+    A ComparisonResult is true when the measures are the same on the attribute and false
+    otherwise, so it can be used wherever the boolean from a have_same_* method is::
+
+      attribute -- the name from ScoreDiff.attributes that was compared
+      part -- the part that was compared
+      msr1 -- the measure of score 1
+      msr2 -- the measure of score 2
+      differences -- a list of Difference tuples, in the order they occur in the measures
+
+    """
+
+    __slots__ = ('attribute', 'part', 'msr1', 'msr2', 'differences')
+
+    def __init__(self, attribute, part, msr1, msr2, differences=None):
+        """Initializes the ComparisonResult object
+
+        Args:
+          attribute (str): the name from ScoreDiff.attributes that was compared
+
+          part (int): the part that was compared
+
+          msr1 (int): the measure of score 1
+
+          msr2 (int): the measure of score 2
+
+        Kwargs:
+          differences (list): Difference tuples, none by default
+
+        """
+        self.attribute = attribute
+        self.part = part
+        self.msr1 = msr1
+        self.msr2 = msr2
+        self.differences = [] if differences is None else differences
+
+    def __bool__(self):
+        return not self.differences
+
+    __nonzero__ = __bool__
+
+    def __iter__(self):
+        return iter(self.differences)
+
+    def __repr__(self):
+        return 'ComparisonResult(%r, part=%r, msr1=%r, msr2=%r, differences=%r)' % (
+            self.attribute, self.part, self.msr1, self.msr2, self.differences)
+
+
+class Profile:
+    """Records how much time, how many calls and how many allocations each phase of a comparison takes
+
+    Profiling is opt in: a Profile given to a ScoreDiff or ScoreIndex replaces the profiled methods
+    of that one instance with timed wrappers, while instances without one run the plain methods and
+    pay nothing.  Pickled or copied instances leave the wrappers behind and are not profiled.  The phases are parsing, building the measure lists, flattening measures, the key,
+    clef and time signature scans, extracting each feature and every comparison method, named after
+    their methods without the underscores, e.g. 'parse', 'flat_notes' or 'have_same_pitches'.
+
+    The time of a phase includes the phases it calls, so 'extract' includes 'flat_notes' and the
+    'get_*' collectors.  Allocations are the number of memory blocks still allocated after each call
+    that were not before, as counted by sys.getallocatedblocks; they are None where Python does not
+    provide it.
+
+    """
+
+    def __init__(self, trace=None):
+        """Initializes a Profile object.
+
+        Kwargs:
+         trace (callable):  Called after every profiled call with the phase name, its wall time in
+         seconds and its allocations, in addition to adding them up
+
+        """
+        import timeit
+
+        self.trace = trace
+        self.clock = timeit.default_timer
+        self.blocks = getattr(sys, 'getallocatedblocks', None)
+        self.phases = {}
+
+    def instrument(self, target, names):
+        """Replaces methods of a single object with wrappers that record them in this profile
+
+        Args:
+          target (object): the ScoreDiff or ScoreIndex to profile
+
+          names (list): the names of the methods to profile
+
+        """
+        for name in names:
+            setattr(target, name, self.wrap(name.strip('_'), getattr(target, name)))
+
+    def wrap(self, phase, function):
+        """Wraps a function so every call to it is recorded under a phase
+
+        Args:
+          phase (str): the name of the phase
+
+          function (callable): the function to time
+
+        Returns:
+          callable
+
+        """
+        clock = self.clock
+        blocks = self.blocks
+
+        def profiled(*args, **kwargs):
+
+            before = None if blocks is None else blocks()
+            start = clock()
+
+            try:
+                return function(*args, **kwargs)
+
+            finally:
+                self.record(phase, clock() - start, None if blocks is None else blocks() - before)
+
+        return profiled
+
+    def record(self, phase, seconds, allocations=None):
+        """Adds a call to the totals of a phase and passes it on to the trace callback
+
+        Args:
+          phase (str): the name of the phase
+
+          seconds (float): the wall time of the call
+
+        Kwargs:
+          allocations (int): the memory blocks it left allocated, or None if they were not counted
+
+        """
+        totals = self.phases.get(phase)
+
+        if(totals is None):
+            totals = self.phases[phase] = [0, 0.0, None]
+
+        totals[0] += 1
+        totals[1] += seconds
+
+        if(not allocations is None):
+            totals[2] = (totals[2] or 0) + allocations
+
+        if(not self.trace is None):
+            self.trace(phase, seconds, allocations)
+
+    def stats(self):
+        """Gets the totals of every phase recorded so far
+
+        Returns:
+          list.  One dict per phase with its 'phase', 'calls', 'seconds' and 'allocations', slowest first
+
+        """
+        stats = [{'phase': phase, 'calls': calls, 'seconds': seconds, 'allocations': allocations}
+                 for phase, (calls, seconds, allocations) in self.phases.items()]
+
+        return sorted(stats, key = lambda stat: (-stat['seconds'], stat['phase']))
+
+    def reset(self):
+        """Forgets every phase recorded so far
+
+        """
+        self.phases = {}
+
+
+class ScoreIndex:
+    """Lazily built lookup tables for the parts and measures of a single parsed score
+
+    Asking music21 for the measures of a part builds a new stream every time, so ScoreDiff keeps
+    one ScoreIndex per score and every comparison looks its measures up here instead.  Each table
+    is built the first time it is needed and then reused.  The same goes for the MeasureFeatures
+    extracted from each measure, which are all the comparison methods need; once they have all
+    been extracted, release lets go of the music21 objects.
+
+    """
+    #For each kind of context, the music21 class of its markings and the Measure attribute holding it
+    contexts = {'key': ('KeySignature', 'keySignature'),
+                'clef': ('Clef', 'clef'),
+                'time': ('TimeSignature', 'timeSignature')}
+
+    #The methods a Profile records: building the measure lists, flattening, the context scans and extraction
+    profiled = ['__build_measures__', '__flat_notes__', '__build_contexts__', '__build_spanner_sites__', '__extract__',
+                '__get_accidentals__', '__get_articulations__', '__get_ornaments__', '__get_pitches__',
+                '__get_spanners__', '__get_stem_directions__']
+
+    #How many flattened measures each index keeps for extracting them again, least recently used first out
+    flat_notes_size = 128
+
+    def __init__(self, score, name = None, profile = None):
+        """Initializes a ScoreIndex object.
+
+        Args:
+         score (music21.stream.Score):  The parsed score to index
+
+        Kwargs:
+         name (str):  The pathname the score was parsed from, used in error messages
+
+         profile (Profile):  Records the time spent building this index, None to leave it unprofiled
+
+        """
+        self.score = score
+        self.name = name
+        self._parts = None
+        self._measures = {}
+        self._offsets = {}
+        self._changes = {}
+        self._contexts = {}
+        self._features = {}
+        self._pitch_codes = {}
+        self._flat_notes = OrderedDict()
+        self._spanner_sites = None
+        self._spanner_ranges = {}
+        self._part_count = None
+
+        if(not profile is None):
+            profile.instrument(self, ScoreIndex.profiled)
+
+    def __getstate__(self):
+        """Gets what is pickled or copied of this ScoreIndex: everything but the wrappers of a Profile
+
+        """
+        return dict((name, value) for name, value in self.__dict__.items() if not name in ScoreIndex.profiled)
+
+    def parts(self):
+        """Gets the parts of the score
+
+        Returns:
+          list.  The music21 Part objects, in score order
+
+        """
+        if(self._parts is None):
+            self._parts = list(self.score.parts)
+
+        return self._parts
+
+    def part_count(self):
+        """Gets the number of parts, which remains available after release
+
+        Returns:
+          int
+
+        """
+        if(self._part_count is None):
+            return len(self.parts())
+
+        return self._part_count
+
+    def measure_count(self, part):
+        """Gets the number of measures of a part, which remains available after release
+
+        Args:
+          part (int): the part to examine
+
+        Returns:
+          int
+
+        """
+        features = self._features.get(part)
+
+        if(features is None):
+            return len(self.measures(part))
+
+        return len(features)
+
+    def measures(self, part):
+        """Gets the measures of a part
+
+        Args:
+          part (int): the part to examine
+
+        Returns:
+          list.  The music21 Measure objects of the part, in score order
+
+        """
+        measures = self._measures.get(part)
+
+        if(measures is None):
+            measures = self.__build_measures__(part)
+            self._measures[part] = measures
+
+        return measures
+
+    def __build_measures__(self, part):
+        """Builds the list of the measures of a part, which music21 builds a new stream for
+
+        Args:
+          part (int): the part to examine
+
+        Returns:
+          list.  The music21 Measure objects of the part, in score order
+
+        """
+        return list(self.parts()[part].getElementsByClass('Measure'))
+
+    def measure_offset(self, part, number):
+        """Gets the position of a measure within measures(part) from its measure number
+
+        Args:
+          part (int): the part to examine
+
+          number (int): a measureNumber as printed in the score
+
+        Returns:
+          int.  The position of the first measure with that number, or None if there is none
+
+        """
+        offsets = self._offsets.get(part)
+
+        if(offsets is None):
+            offsets = {}
+
+            for offset, measure in enumerate(self.measures(part)):
+                offsets.setdefault(measure.measureNumber, offset)
+
+            self._offsets[part] = offsets
+
+        return offsets.get(number)
+
+    def measure_by_number(self, part, number):
+        """Gets a measure from its measure number
+
+        Args:
+          part (int): the part to examine
+
+          number (int): a measureNumber as printed in the score
+
+        Returns:
+          music21.stream.Measure.  The first measure with that number, or None if there is none
+
+        """
+        offset = self.measure_offset(part, number)
+
+        if(offset is None):
+            return None
+
+        return self.measures(part)[offset]
+
+    def most_recent_change(self, part, msr, kind):
+        """Gets the measure number of the most recent change of key, clef or time signature
+
+        Args:
+          part (int): the part to examine
+
+          msr (int): the position of the measure within measures(part)
+
+          kind (str): 'key', 'clef' or 'time'
+
+        Returns:
+          int.  The measure number of the latest change at or before the measure, or 0 if there is none
+
+        """
+        changes = self._changes.get((part, kind))
+
+        if(changes is None):
+            self.__build_contexts__(part)
+            changes = self._changes[(part, kind)]
+
+        target_measure = self.measures(part)[msr].measureNumber
+        position = bisect_right(changes, target_measure)
+
+        if(position == 0):
+            return 0
+
+        return changes[position - 1]
+
+    def context(self, part, kind):
+        """Gets the key signature, clef or time signature in effect at each measure of a part
+
+        Measures without a marking of their own take it from the measure holding the most recent
+        change, so the table gives the same answer as looking the change up measure by measure.
+
+        Args:
+          part (int): the part to examine
+
+          kind (str): 'key', 'clef' or 'time'
+
+        Returns:
+          list.  One music21 KeySignature, Clef or TimeSignature per measure (None if no marking was found)
+
+        """
+        context = self._contexts.get((part, kind))
+
+        if(context is None):
+            self.__build_contexts__(part)
+            context = self._contexts[(part, kind)]
+
+        return context
+
+    def __build_contexts__(self, part):
+        """Builds the change lists and context tables of a part for every kind of context at once
+
+        Args:
+          part (int): the part to examine
+
+        """
+        measures = self.measures(part)
+        held = []
+
+        #looking in each measure is linear, while asking each marking of the flattened part for
+        #its measureNumber makes music21 search the whole part again every time; a single pass over
+        #each flattened measure finds the markings of every kind at once
+        for measure in measures:
+
+            classes = set()
+
+            for element in measure.flat:
+                classes.update(element.classes)
+
+            held.append(classes)
+
+        for kind in ScoreIndex.contexts:
+
+            class_name, attribute = ScoreIndex.contexts[kind]
+            changes = set()
+
+            for msr, measure in enumerate(measures):
+
+                if(not measure.measureNumber is None and measure.measureNumber > 0 and class_name in held[msr]):
+
+                    changes.add(measure.measureNumber)
+
+            changes = sorted(changes)
+            self._changes[(part, kind)] = changes
+            context = []
+            sources = {}
+
+            for msr, measure in enumerate(measures):
+
+                #music21 searches the measure for its marking every time it is asked, so only measures
+                #that hold one are asked, and each measure a marking is taken from is asked once
+                marking = None
+
+                if(class_name in held[msr]):
+                    marking = getattr(measure, attribute)
+
+                if(marking is None):
+
+                    current = self.most_recent_change(part, msr, kind)
+
+                    if(not current in sources):
+
+                        source = self.measure_by_number(part, current)
+                        sources[current] = None if source is None else getattr(source, attribute)
+
+                    marking = sources[current]
+
+                context.append(marking)
+
+            self._contexts[(part, kind)] = context
+
+    def features(self, part, msr, keep=True):
+        """Gets the extracted features of a measure, extracting them the first time they are asked for
+
+        Args:
+          part (int): the part to examine
+
+          msr (int): the position of the measure within measures(part)
+
+        Kwargs:
+          keep (bool): keep newly extracted features for the next call, False to extract them again
+
+        Returns:
+          MeasureFeatures
+
+        """
+        features = self._features.get(part)
+
+        if(features is None):
+
+            if(not keep):
+                return self.__extract__(part, msr)
+
+            features = [None] * len(self.measures(part))
+            self._features[part] = features
+
+        if(features[msr] is None):
+
+            if(not keep):
+                return self.__extract__(part, msr)
+
+            features[msr] = self.__extract__(part, msr)
+
+        return features[msr]
+
+    def positions(self, part, msr, attribute):
+        """Gets the offsets within a measure of the notes the entries of one of its fields came from
+
+        Offsets are only needed to say where a difference is, so they are not kept with the features
+        and comparisons that only want a boolean never collect them.  They are collected again from
+        the flattened measure when a detailed comparison asks for them.  Once the index is released
+        the notes are gone, and every offset is None.
+
+        Args:
+          part (int): the part to examine
+
+          msr (int): the position of the measure within measures(part)
+
+          attribute (str): a name from ScoreDiff.attributes
+
+        Returns:
+          tuple.  One offset per entry of the field, or None for the key, clef and time signature
+
+        """
+        if(attribute.endswith('_ignore_order')):
+            attribute = attribute[:-len('_ignore_order')]
+
+        if(attribute in ('clef_markings', 'key_signature', 'time_signature')):
+            return None
+
+        if(self.score is None):
+            return (None,) * len(getattr(self.features(part, msr), attribute))
+
+        notes = self.__flat_notes__(part, msr)
+        offsets = []
+
+        if(attribute == 'accidentals'):
+            self.__get_accidentals__(notes, self.context(part, 'key')[msr], offsets)
+        else:
+            getattr(self, '__get_' + attribute + '__')(notes, offsets)
+
+        return tuple(offsets)
+
+    def fingerprints(self, part):
+        """Gets the fingerprint of every measure of a part
+
+        Args:
+          part (int): the part to examine
+
+        Returns:
+          list.  One MeasureFeatures.fingerprint per measure, in score order
+
+        """
+        return [self.features(part, msr).fingerprint() for msr in range(0, self.measure_count(part))]
+
+    def counts(self, part, field, start=0, stop=None):
+        """Counts how often each value of a field occurs in a range of measures of a part
+
+        Args:
+          part (int): the part to examine
+
+          field (str): a tuple field of MeasureFeatures, e.g. 'pitches'
+
+        Kwargs:
+          start (int): the first measure of the range
+
+          stop (int): the measure after the last one of the range, defaults to the end of the part
+
+        Returns:
+          collections.Counter
+
+        """
+        counts = Counter()
+        count = self.measure_count(part)
+
+        for msr in range(max(0, start), count if stop is None else min(stop, count)):
+            counts.update(getattr(self.features(part, msr), field))
+
+        return counts
+
+    def pitch_codes(self, part):
+        """Gets the pitches of every measure of a part as one NumPy array of integers, built once per part
+
+        Every pitch is encoded from its name with _pitch_code as its MIDI number times 512 plus a
+        code for its spelling and whether its octave is implicit, so two pitches have the same code exactly when they have the same
+        name, and sorting the codes sorts the pitches from low to high.
+
+        Args:
+          part (int): the part to examine
+
+        Returns:
+          tuple.  (codes, bounds), where codes holds the pitches of every measure in score order and
+          the pitches of measure msr are codes[bounds[msr]:bounds[msr + 1]]
+
+        """
+        if(not part in self._pitch_codes):
+            numpy = _numpy()
+            names = [self.features(part, msr).pitches for msr in range(0, self.measure_count(part))]
+
+            codes = numpy.fromiter((_pitch_code(name) for pitches in names for name in pitches), numpy.int64)
+            bounds = numpy.zeros(len(names) + 1, numpy.int64)
+            numpy.cumsum([len(pitches) for pitches in names], out = bounds[1:])
+
+            self._pitch_codes[part] = (codes, bounds)
+
+        return self._pitch_codes[part]
+
+    def prepare(self, part):
+        """Builds the tables every measure of a part is extracted with, ahead of extracting any of them
+
+        These are the measure list, the key, clef and time signature tables and the spanner map.
+        Processes forked afterwards share them instead of building their own.
+
+        Args:
+          part (int): the part to examine
+
+        """
+        if(self.score is None):
+            return
+
+        self.context(part, 'key')
+        self.__spanner_sites__()
+
+    def spanner_ranges(self, part):
+        """Gets every spanner attached to the notes of a part with the measures it covers, built once per part
+
+        The ranges remain available after release.
+
+        Args:
+          part (int): the part to examine
+
+        Returns:
+          tuple.  (class name, first measure, last measure) for each spanner, ordered by where it
+          starts and ends, with measures given as positions within measures(part)
+
+        """
+        ranges = self._spanner_ranges.get(part)
+
+        if(ranges is None):
+
+            found = OrderedDict()
+
+            #a score without spanners does not need to be looked through
+            if(self.__spanner_sites__()):
+
+                for msr in range(0, len(self.measures(part))):
+
+                    for note in self.__flat_notes__(part, msr):
+
+                        for spanner in self.__spanners_of__(note):
+
+                            if(id(spanner) in found):
+                                found[id(spanner)][2] = msr
+                            else:
+                                found[id(spanner)] = [type(spanner).__name__, msr, msr]
+
+            ranges = tuple(sorted((tuple(entry) for entry in found.values()),
+                                  key = lambda entry: (entry[1], entry[2], entry[0])))
+            self._spanner_ranges[part] = ranges
+
+        return ranges
+
+    def reuse(self, previous, edited):
+        """Takes over the features of the measures that were not edited from the index of an earlier version
+
+        A measure is only taken over when it was not edited, it had already been extracted and the
+        key, clef and time signature in effect are still the same, since an edit can change those
+        for the measures that follow it.  Spanners cross barlines as well, so every measure covered
+        by a spanner that touches an edited measure, in either version, is extracted again too.
+        Parts without edits are taken over without looking at their markings, and parts whose
+        number of measures changed are not taken over at all.
+
+        Args:
+          previous (ScoreIndex): the index of the earlier version of the score
+
+          edited (dict): maps part numbers to the measure numbers that were edited
+
+        """
+        for part in range(0, min(self.part_count(), previous.part_count())):
+
+            count = self.measure_count(part)
+            earlier = previous._features.get(part)
+
+            if(earlier is None or count != len(earlier)):
+                continue
+
+            changed = set(edited.get(part, ()))
+            features = [None] * count
+
+            #a released earlier version kept its spanner ranges, so both versions can be looked at
+            if(changed):
+
+                for name, first, last in previous.spanner_ranges(part) + self.spanner_ranges(part):
+
+                    if(any(first <= msr <= last for msr in edited.get(part, ()))):
+                        changed.update(range(first, last + 1))
+
+            for msr in range(0, count):
+
+                if(msr in changed or earlier[msr] is None):
+                    continue
+
+                if(changed and self.__context_values__(part, msr) != (earlier[msr].key_signature,
+                                                                      earlier[msr].clef_markings,
+                                                                      earlier[msr].time_signature)):
+                    continue
+
+                features[msr] = earlier[msr]
+
+            self._features[part] = features
+
+    def release(self):
+        """Extracts the features of every measure and then drops every reference to music21 objects
+
+        """
+        if(self.score is None):
+            return
+
+        self._part_count = len(self.parts())
+
+        for part in range(0, self._part_count):
+
+            for msr in range(0, len(self.measures(part))):
+
+                self.features(part, msr)
+
+            self.spanner_ranges(part)
+
+        self.score = None
+        self._parts = None
+        self._measures = {}
+        self._offsets = {}
+        self._contexts = {}
+        self._flat_notes.clear()
+        self._spanner_sites = None
+
+    def detached(self):
+        """Gets a released copy of the index, e.g. to send to another process, and leaves this one as it is
+
+        Every measure is extracted first, as for release, and this index keeps the features too.
+
+        Returns:
+          ScoreIndex
+
+        """
+        if(self.score is None):
+            return self
+
+        for part in range(0, len(self.parts())):
+
+            for msr in range(0, len(self.measures(part))):
+
+                self.features(part, msr)
+
+            self.spanner_ranges(part)
+
+        index = copy.copy(self)
+        index._features = dict((part, list(features)) for part, features in self._features.items())
+        index._changes = dict(self._changes)
+        index._pitch_codes = dict(self._pitch_codes)
+        index._spanner_ranges = dict(self._spanner_ranges)
+        index._flat_notes = OrderedDict()
+        index.release()
+
+        return index
+
+    def __extract__(self, part, msr):
+        """Extracts the features of a measure from its flattened notes and the context tables
+
+        Args:
+          part (int): the part to examine
+
+          msr (int): the position of the measure within measures(part)
+
+        Returns:
+          MeasureFeatures
+
+        """
+        notes = self.__flat_notes__(part, msr)
+
+        features = MeasureFeatures()
+        features.key_signature, features.clef_markings, features.time_signature = self.__context_values__(part, msr)
+
+        collected = {'accidentals': self.__get_accidentals__(notes, self.context(part, 'key')[msr]),
+                     'articulations': self.__get_articulations__(notes),
+                     'ornaments': self.__get_ornaments__(notes),
+                     'pitches': self.__get_pitches__(notes),
+                     'spanners': self.__get_spanners__(notes),
+                     'stem_directions': self.__get_stem_directions__(notes)}
+
+        for name, values in collected.items():
+            setattr(features, name, values)
+
+        return features
+
+    def __flat_notes__(self, part, msr):
+        """Flattens a measure and gets its notes and chords, keeping the last flat_notes_size of them
+
+        Every feature of a measure is collected from the same flattened notes, and extracting a
+        measure again, as iter_differences does for the features it does not keep, reuses them
+        while they are among the most recently flattened.
+
+        Args:
+          part (int): the part to examine
+
+          msr (int): the position of the measure within measures(part)
+
+        Returns:
+          music21.stream.Stream
+
+        """
+        key = (part, msr)
+        notes = self._flat_notes.pop(key, None)
+
+        if(notes is None):
+            notes = self.measures(part)[msr].flat.notes
+
+        self._flat_notes[key] = notes
+
+        while(len(self._flat_notes) > self.flat_notes_size):
+            self._flat_notes.popitem(last=False)
+
+        return notes
+
+    def __context_values__(self, part, msr):
+        """Gets the compared values of the key signature, clef and time signature in effect at a measure
+
+        Args:
+          part (int): the part to examine
+
+          msr (int): the position of the measure within measures(part)
+
+        Returns:
+          tuple.  (sharps, clef sign, (numerator, denominator)), with None for any missing marking
+
+        """
+        key_signature = self.context(part, 'key')[msr]
+        clef = self.context(part, 'clef')[msr]
+        time_signature = self.context(part, 'time')[msr]
+
+        sharps = None if key_signature is None else key_signature.sharps
+        sign = None if clef is None else clef.sign
+
+        if(time_signature is None):
+            return (sharps, sign, None)
+
+        return (sharps, sign, (time_signature.numerator, time_signature.denominator))
+
+    def __get_accidentals__(self, notes, key_signature, offsets=None):
+        """Collects the accidentals of a group of notes that are not already implied by the key signature
+
+        Args:
+          notes (music21.stream.Stream): the notes of a measure
+
+          key_signature (music21.key.KeySignature): the key signature in effect for those notes
+
+        Kwargs:
+          offsets (list): a list to add the offset of the note of each entry to, for detailed comparisons
+
+        Returns:
+          tuple.  The names of the accidentals in the order they occur
+
+        """
+        altered = []
+
+        if(not key_signature is None):
+            altered = [x.name for x in key_signature.alteredPitches]
+
+        accidentals = []
+
+        for note in notes:
+
+            if(note.isChord):
+
+                for pitch in note.pitches:
+
+                    if(not pitch.accidental is None and not pitch.name in altered):
+
+                        accidentals.append(pitch.accidental.name)
+
+                        if(not offsets is None):
+                            offsets.append(float(note.offset))
+
+            elif(not note.accidental is None and not note.name in altered):
+
+                accidentals.append(note.accidental.name)
+
+                if(not offsets is None):
+                    offsets.append(float(note.offset))
+
+        return tuple(accidentals)
+
+    def __get_articulations__(self, notes, offsets=None):
+        """Collects the articulations of a group of notes
+
+        Args:
+          notes (music21.stream.Stream): the notes of a measure
+
+        Kwargs:
+          offsets (list): a list to add the offset of the note of each entry to, for detailed comparisons
+
+        Returns:
+          tuple.  The class names of the articulations in the order they occur
+
+        """
+        articulations = []
+
+        for note in notes:
+
+            for articulation in note.articulations:
+
+                articulations.append(type(articulation).__name__)
+
+                if(not offsets is None):
+                    offsets.append(float(note.offset))
+
+        return tuple(articulations)
+
+    def __get_pitches__(self, notes, offsets=None):
+        """Collects the pitches of a group of notes
+
+        Args:
+          notes (music21.stream.Stream): the notes of a measure
+
+        Kwargs:
+          offsets (list): a list to add the offset of the note of each entry to, for detailed comparisons
+
+        Returns:
+          tuple.  The names with octave of the pitches in the order they occur
+
+        """
+        pitches = []
+
+        for note in notes:
+
+            for pitch in note.pitches:
+
+                pitches.append(pitch.nameWithOctave)
+
+                if(not offsets is None):
+                    offsets.append(float(note.offset))
+
+        return tuple(pitches)
+
+    def __get_ornaments__(self, notes, offsets=None):
+        """Collects the ornaments of a group of notes
+
+        Each expression counts once, as the most specific of its classes named in ScoreDiff.ornaments,
+        so a HalfStepMordent is a 'HalfStepMordent' rather than also a 'Mordent' and a 'GeneralMordent'.
+
+        Args:
+          notes (music21.stream.Stream): the notes of a measure
+
+        Kwargs:
+          offsets (list): a list to add the offset of the note of each entry to, for detailed comparisons
+
+        Returns:
+          tuple.  The class names of the ornaments in the order they occur
+
+        """
+        ornaments = []
+        table = _ornament_table()
+
+        for note in notes:
+
+            for expression in note.expressions:
+
+                kind = type(expression)
+                name = table[kind] if kind in table else _ornament_name(table, kind)
+
+                if(not name is None):
+
+                    ornaments.append(name)
+
+                    if(not offsets is None):
+                        offsets.append(float(note.offset))
+
+        return tuple(ornaments)
+
+    def __get_spanners__(self, notes, offsets=None):
+        """Collects the spanners attached to a group of notes
+
+        Args:
+          notes (music21.stream.Stream): the notes of a measure
+
+        Kwargs:
+          offsets (list): a list to add the offset of the note of each entry to, for detailed comparisons
+
+        Returns:
+          tuple.  The class names of the spanner sites in the order their notes occur
+
+        """
+        spanners = []
+
+        for note in notes:
+
+            names = [type(spanner).__name__ for spanner in self.__spanners_of__(note)]
+
+            spanners += names
+
+            if(not offsets is None):
+                offsets.extend([float(note.offset)] * len(names))
+
+        return tuple(spanners)
+
+    def __spanners_of__(self, note):
+        """Looks up the spanners attached to a note or chord
+
+        Args:
+          note (music21.note.GeneralNote): a note or chord of the score
+
+        Returns:
+          list.  The spanners of the note, and of each of its pitches for a chord
+
+        """
+        sites = self.__spanner_sites__()
+        spanners = sites.get(id(note), [])
+
+        #newer music21 releases attach spanners to the chord, older ones to each of its pitches
+        if(note.isChord):
+
+            spanners = list(spanners)
+
+            for pitch in note.pitches:
+                spanners += sites.get(id(pitch), [])
+
+        return spanners
+
+    def __spanner_sites__(self):
+        """Gets the map from every spanned element of the score to its spanners, building it once
+
+        Returns:
+          dict.  Maps the id of each spanned note, chord or pitch to the list of its spanners
+
+        """
+        if(self._spanner_sites is None):
+            self._spanner_sites = self.__build_spanner_sites__()
+
+        return self._spanner_sites
+
+    def __build_spanner_sites__(self):
+        """Maps the elements of the score to their spanners in a single pass over the spanners
+
+        Asking each note for its spanner sites walks its references again for every note, while a
+        spanner is defined once for all the notes it covers.  Elements are keyed by id, since music21
+        notes with the same pitch compare equal.
+
+        Returns:
+          dict.  Maps the id of each spanned note, chord or pitch to the list of its spanners
+
+        """
+        sites = {}
+
+        for spanner in self.score.flat.getElementsByClass('Spanner'):
+
+            for element in spanner.getSpannedElements():
+                sites.setdefault(id(element), []).append(spanner)
+
+        return sites
+
+    def __get_stem_directions__(self, notes, offsets=None):
+        """Collects the stem directions of a group of notes in a single pass
+
+        A note contributes its stem direction.  A chord contributes the distinct stem directions of
+        its pitches, in the order of its pitches, so a chord with one stem counts once and a chord
+        split between two stems counts twice.
+
+        Args:
+          notes (music21.stream.Stream): the notes of a measure
+
+        Kwargs:
+          offsets (list): a list to add the offset of the note of each entry to, for detailed comparisons
+
+        Returns:
+          tuple.  The stem directions in the order their notes occur
+
+        """
+        stems = []
+
+        for note in notes:
+
+            if(note.isChord):
+                directions = []
+
+                for pitch in note.pitches:
+
+                    direction = note.getStemDirection(pitch)
+
+                    if(not direction in directions):
+                        directions.append(direction)
+
+            else:
+                directions = [note.stemDirection]
+
+            stems += directions
+
+            if(not offsets is None):
+                offsets.extend([float(note.offset)] * len(directions))
+
+        return tuple(stems)
+
+
+class ScoreException(Exception):
+        """Class for handling exceptions while using the ScoreDiff tool
+
+
+        """
+        def __init__(self , value):
+                """Initializes the ScoreException object
+
+                Args:
+                 value (str): An error message
+
+                """
+                self.value = value
+
+        def __str__(self):
+                """Function for fetching this object's error message
+                Returns:
+                 This object's error message
+
+                """
+                return repr(self.value)
+
+
+def align_sequences(sequence1, sequence2):
+    """Finds the operations that turn one sequence into another, in close to linear time
+
+    Elements that match at the start or end are stripped first.  The elements that occur exactly
+    once in what is left of both sequences then act as anchors: the longest run of anchors that
+    appear in the same order in both sequences is matched, and the gaps between them are aligned
+    the same way.  A gap without anchors, such as one made of repeated measures, is aligned on a
+    common subsequence found with _common_subsequence, in linear space, and paired up by position
+    when it shares no elements or has too many differences to search.  Elements left over between
+    two matches are paired up as modified, and the rest counted as inserted or deleted, so 'modify'
+    is never given for equal elements.
+
+    Args:
+      sequence1 (list):  The original sequence of hashable elements
+
+      sequence2 (list):  The changed sequence
+
+    Returns:
+      list.  (operation, index1, index2) tuples in order, where operation is 'equal', 'modify',
+      'delete' (index2 is None) or 'insert' (index1 is None)
+
+    """
+    operations = []
+
+    #segments still to align, with lists of finished operations in between them, last one on top
+    stack = [(0, len(sequence1), 0, len(sequence2))]
+
+    while(stack):
+
+        item = stack.pop()
+
+        if(isinstance(item, list)):
+            operations += item
+            continue
+
+        start1, stop1, start2, stop2 = item
+
+        while(start1 < stop1 and start2 < stop2 and sequence1[start1] == sequence2[start2]):
+            operations.append(('equal', start1, start2))
+            start1 += 1
+            start2 += 1
+
+        suffix = []
+
+        while(start1 < stop1 and start2 < stop2 and sequence1[stop1 - 1] == sequence2[stop2 - 1]):
+            stop1 -= 1
+            stop2 -= 1
+            suffix.append(('equal', stop1, stop2))
+
+        suffix.reverse()
+        anchors = _unique_anchors(sequence1, start1, stop1, sequence2, start2, stop2)
+
+        if(not anchors):
+
+            for index1, index2 in _common_subsequence(sequence1, start1, stop1, sequence2, start2, stop2) + [(stop1, stop2)]:
+
+                paired = min(index1 - start1, index2 - start2)
+                operations += [('modify', start1 + offset, start2 + offset) for offset in range(0, paired)]
+                operations += [('delete', msr, None) for msr in range(start1 + paired, index1)]
+                operations += [('insert', None, msr) for msr in range(start2 + paired, index2)]
+
+                if(index1 < stop1):
+                    operations.append(('equal', index1, index2))
+
+                start1 = index1 + 1
+                start2 = index2 + 1
+
+            operations += suffix
+            continue
+
+        stack.append(suffix)
+        anchors.append((stop1, stop2))
+
+        for position in range(len(anchors) - 1, -1, -1):
+
+            index1, index2 = anchors[position]
+
+            if(position < len(anchors) - 1):
+                stack.append([('equal', index1, index2)])
+
+            if(position == 0):
+                stack.append((start1, index1, start2, index2))
+            else:
+                stack.append((anchors[position - 1][0] + 1, index1, anchors[position - 1][1] + 1, index2))
+
+    return operations
+
+#How much work, in elements searched times differences, a gap without anchors may take with Myers'
+#algorithm before the rest of it is paired up by position
+_alignment_budget = 1000000
+
+def _common_subsequence(sequence1, start1, stop1, sequence2, start2, stop2):
+    """Finds a long common subsequence of two ranges with the linear space version of Myers' algorithm
+
+    Each range is split at the middle snake of its shortest edit script, the longest run of matches
+    around the middle of it, and the two halves are searched the same way.  A range that needs more
+    than about _alignment_budget / (its size) differences, and any two ranges with no element in
+    common, are paired by position instead, so the time stays close to linear in the size of the
+    ranges and the memory used is linear.
+
+    Args:
+      sequence1 (list):  The original sequence
+
+      start1 (int):  The start of the range of sequence1
+
+      stop1 (int):  The end of the range of sequence1
+
+      sequence2 (list):  The changed sequence
+
+      start2 (int):  The start of the range of sequence2
+
+      stop2 (int):  The end of the range of sequence2
+
+    Returns:
+      list.  (index1, index2) pairs of matching elements, in increasing order of both indexes
+
+    """
+    if(not set(sequence1[start1:stop1]).intersection(sequence2[start2:stop2])):
+        return []
+
+    pairs = []
+
+    #ranges still to search, with lists of finished pairs in between them, last one on top
+    stack = [(start1, stop1, start2, stop2)]
+
+    while(stack):
+
+        item = stack.pop()
+
+        if(isinstance(item, list)):
+            pairs += item
+            continue
+
+        start1, stop1, start2, stop2 = item
+
+        while(start1 < stop1 and start2 < stop2 and sequence1[start1] == sequence2[start2]):
+            pairs.append((start1, start2))
+            start1 += 1
+            start2 += 1
+
+        suffix = []
+
+        while(start1 < stop1 and start2 < stop2 and sequence1[stop1 - 1] == sequence2[stop2 - 1]):
+            stop1 -= 1
+            stop2 -= 1
+            suffix.append((stop1, stop2))
+
+        suffix.reverse()
+
+        if(start1 == stop1 or start2 == stop2):
+            pairs += suffix
+            continue
+
+        snake = _middle_snake(sequence1, start1, stop1, sequence2, start2, stop2,
+                              _alignment_budget // (stop1 - start1 + stop2 - start2) + 1)
+
+        if(snake is None):
+            pairs += [(start1 + offset, start2 + offset) for offset in range(0, min(stop1 - start1, stop2 - start2))
+                      if sequence1[start1 + offset] == sequence2[start2 + offset]]
+            pairs += suffix
+            continue
+
+        x, y, u, v = snake
+
+        stack.append(suffix)
+        stack.append((start1 + u, stop1, start2 + v, stop2))
+        stack.append([(start1 + offset, start2 + y - x + offset) for offset in range(x, u)])
+        stack.append((start1, start1 + x, start2, start2 + y))
+
+    return pairs
+
+def _middle_snake(sequence1, start1, stop1, sequence2, start2, stop2, limit):
+    """Finds the middle snake of the shortest edit script of two ranges, searching from both ends at once
+
+    The ranges must differ in their first and in their last elements.
+
+    Args:
+      sequence1 (list):  The original sequence
+
+      start1 (int):  The start of the range of sequence1
+
+      stop1 (int):  The end of the range of sequence1
+
+      sequence2 (list):  The changed sequence
+
+      start2 (int):  The start of the range of sequence2
+
+      stop2 (int):  The end of the range of sequence2
+
+      limit (int):  The most differences to search for from each end
+
+    Returns:
+      tuple.  (x, y, u, v), the snake from (x, y) to (u, v) relative to the starts of the ranges,
+      or None if the ranges have more than 2 * limit differences
+
+    """
+    length1 = stop1 - start1
+    length2 = stop2 - start2
+    delta = length1 - length2
+    odd = delta % 2 != 0
+
+    #furthest position reached in sequence1 on each diagonal k = x - y from the start, and on each
+    #diagonal from the end, counted backwards from the ends of the ranges
+    forward = {1: 0}
+    backward = {1: 0}
+
+    for differences in range(0, min(limit, (length1 + length2 + 1) // 2) + 1):
+
+        for k in range(-differences, differences + 1, 2):
+
+            if(k == -differences or (k != differences and forward[k - 1] < forward[k + 1])):
+                x = forward[k + 1]
+            else:
+                x = forward[k - 1] + 1
+
+            y = x - k
+            snake_x, snake_y = x, y
+
+            while(x < length1 and y < length2 and sequence1[start1 + x] == sequence2[start2 + y]):
+                x += 1
+                y += 1
+
+            forward[k] = x
+
+            if(odd and abs(delta - k) < differences and x + backward[delta - k] >= length1):
+                return (snake_x, snake_y, x, y)
+
+        for k in range(-differences, differences + 1, 2):
+
+            if(k == -differences or (k != differences and backward[k - 1] < backward[k + 1])):
+                x = backward[k + 1]
+            else:
+                x = backward[k - 1] + 1
+
+            y = x - k
+            snake_x, snake_y = x, y
+
+            while(x < length1 and y < length2 and sequence1[stop1 - x - 1] == sequence2[stop2 - y - 1]):
+                x += 1
+                y += 1
+
+            backward[k] = x
+
+            if(not odd and abs(delta - k) <= differences and x + forward[delta - k] >= length1):
+                return (length1 - x, length2 - y, length1 - snake_x, length2 - snake_y)
+
+    return None
+
+def _unique_anchors(sequence1, start1, stop1, sequence2, start2, stop2):
+    """Finds the longest run of elements that occur once in both ranges and in the same order in both
+
+    Args:
+      sequence1 (list):  The original sequence
+
+      start1 (int):  The start of the range of sequence1
+
+      stop1 (int):  The end of the range of sequence1
+
+      sequence2 (list):  The changed sequence
+
+      start2 (int):  The start of the range of sequence2
+
+      stop2 (int):  The end of the range of sequence2
+
+    Returns:
+      list.  (index1, index2) pairs of matching elements, in increasing order of both indexes
+
+    """
+    counts = {}
+
+    for index in range(start1, stop1):
+        count, position = counts.get(sequence1[index], (0, None))
+        counts[sequence1[index]] = (count + 1, index)
+
+    matches = {}
+
+    for index in range(start2, stop2):
+        element = sequence2[index]
+
+        if(counts.get(element, (0, None))[0] == 1):
+            matches[element] = None if element in matches else index
+
+    pairs = sorted((counts[element][1], index) for element, index in matches.items() if not index is None)
+
+    #longest increasing subsequence of the second indexes, by patience sorting
+    tails = []
+    tail_positions = []
+    previous = [None] * len(pairs)
+
+    for position, (index1, index2) in enumerate(pairs):
+
+        pile = bisect_right(tails, index2)
+
+        if(pile > 0):
+            previous[position] = tail_positions[pile - 1]
+
+        if(pile == len(tails)):
+            tails.append(index2)
+            tail_positions.append(position)
+        else:
+            tails[pile] = index2
+            tail_positions[pile] = position
+
+    anchors = []
+    position = tail_positions[-1] if tail_positions else None
+
+    while(not position is None):
+        anchors.append(pairs[position])
+        position = previous[position]
+
+    anchors.reverse()
+    return anchors
+
+def _compare_features(attribute, part, msr1, msr2, features1, features2, index1, index2):
+    """Compares one attribute of two extracted measures and lists the differences
+
+    Args:
+      attribute (str):  A name from ScoreDiff.attributes
+
+      part (int):  The part the measures belong to
+
+      msr1 (int):  The measure of score 1
+
+      msr2 (int):  The measure of score 2
+
+      features1 (MeasureFeatures):  The features of the measure of score 1
+
+      features2 (MeasureFeatures):  The features of the measure of score 2
+
+      index1 (ScoreIndex):  The index of score 1, which the offsets of the differences are collected from
+
+      index2 (ScoreIndex):  The index of score 2
+
+    Returns:
+      ComparisonResult
+
+    """
+    result = ComparisonResult(attribute, part, msr1, msr2)
+
+    if(features1.fingerprint() == features2.fingerprint()):
+        return result
+
+    if(features1.value(attribute) == features2.value(attribute)):
+        return result
+
+    positions1 = index1.positions(part, msr1, attribute)
+    positions2 = index2.positions(part, msr2, attribute)
+
+    if(attribute.endswith('_ignore_order')):
+        field = attribute[:-len('_ignore_order')]
+        result.differences = _unordered_differences(getattr(features1, field), positions1,
+                                                    getattr(features2, field), positions2)
+    else:
+        result.differences = _differences(features1.value(attribute), positions1,
+                                          features2.value(attribute), positions2)
+
+    return result
+
+#The ornament table built from ScoreDiff.ornaments, under 'table', and the names it was built from, under 'names'
+_ornaments = {}
+
+def _ornament_table():
+    """Gets the table mapping music21 expression classes to the ornament names they count as
+
+    The table starts out with the classes of music21.expressions named in ScoreDiff.ornaments and
+    learns every other class it is asked about through _ornament_name, so each class is only looked
+    at once.  It is built again if ScoreDiff.ornaments changes.  Names music21 does not define are
+    logged, since they can never match.
+
+    Returns:
+      dict.  Maps classes to an ornament name, or to None for expressions that are not ornaments
+
+    """
+    names = tuple(ScoreDiff.ornaments)
+
+    if(_ornaments.get('names') != names):
+
+        expressions = _music21('expressions')
+        table = {}
+
+        for name in names:
+
+            kind = getattr(expressions, name, None)
+
+            if(isinstance(kind, type) and issubclass(kind, expressions.Expression)):
+                table[kind] = name
+
+            else:
+                logger.warning("%s is not an expression in this version of music21, so it never matches", name)
+
+        _ornaments['table'] = table
+        _ornaments['names'] = names
+
+    return _ornaments['table']
+
+def _ornament_name(table, kind):
+    """Looks up the ornament name of an expression class that is not in the table yet, and adds it
+
+    Args:
+      table (dict): the table from _ornament_table
+
+      kind (type): the class of an expression
+
+    Returns:
+      str.  The most specific ornament name among the class and its bases, or None if there is none
+
+    """
+    name = None
+
+    for base in kind.__mro__:
+
+        if(base in table and not table[base] is None):
+
+            name = table[base]
+            break
+
+    table[kind] = name
+    return name
+
+def _numpy():
+    """Imports NumPy, which only the array based comparisons need
+
+    Returns:
+      module
+
+    Raises:
+      ScoreException
+
+    """
+    try:
+        return importlib.import_module('numpy')
+
+    except ImportError:
+        raise ScoreException("NumPy is required for array based pitch comparisons")
+
+#Semitones above C of each step, and the spelling code of each accidental character
+_steps = {'C': 0, 'D': 2, 'E': 4, 'F': 5, 'G': 7, 'A': 9, 'B': 11}
+_alters = {'#': 2, '-': -2, '~': 1, '`': -1}
+
+#The octave music21 sounds a pitch in when it was given none, as for note.Note('C')
+_implicit_octave = 4
+
+def _pitch_code(name):
+    """Encodes the name with octave of a pitch, e.g. 'C#4', 'B-3' or 'C', as an integer
+
+    A pitch without an octave sounds in _implicit_octave, as in music21, but is kept apart from
+    the same pitch with that octave written out, since their names differ.
+
+    Args:
+      name (str):  A name as given by music21's Pitch.nameWithOctave
+
+    Returns:
+      int.  The MIDI number times 512, plus 256 for an implicit octave, plus a code for the step
+      and the accidental, in half sharps
+
+    """
+    octave = len(name)
+
+    while(octave > 1 and name[octave - 1].isdigit()):
+        octave -= 1
+
+    implicit = octave == len(name)
+    step = name[0]
+    half_sharps = sum(_alters[character] for character in name[1:octave])
+    midi = 12 * ((_implicit_octave if implicit else int(name[octave:])) + 1) + _steps[step] + int(math.floor(half_sharps / 2.0 + 0.5))
+
+    return midi * 512 + implicit * 256 + "CDEFGAB".index(step) * 32 + half_sharps + 16
+
+def _pitch_matches(codes1, bounds1, codes2, bounds2, ignore_order):
+    """Compares the encoded pitches of every measure of a part of two scores at once
+
+    Args:
+      codes1 (numpy.ndarray):  The pitch codes of score 1, from ScoreIndex.pitch_codes
+
+      bounds1 (numpy.ndarray):  Where the measures of score 1 start in codes1
+
+      codes2 (numpy.ndarray):  The pitch codes of score 2
+
+      bounds2 (numpy.ndarray):  Where the measures of score 2 start in codes2
+
+      ignore_order (bool):  Sort the pitches within every measure before comparing them
+
+    Returns:
+      numpy.ndarray.  One bool per measure both scores have
+
+    """
+    numpy = _numpy()
+    count = min(len(bounds1), len(bounds2)) - 1
+
+    codes1 = codes1[:bounds1[count]]
+    codes2 = codes2[:bounds2[count]]
+    lengths1 = numpy.diff(bounds1[:count + 1])
+    lengths2 = numpy.diff(bounds2[:count + 1])
+    measures1 = numpy.repeat(numpy.arange(count), lengths1)
+    measures2 = numpy.repeat(numpy.arange(count), lengths2)
+
+    if(ignore_order):
+        codes1 = codes1[numpy.lexsort((codes1, measures1))]
+        codes2 = codes2[numpy.lexsort((codes2, measures2))]
+
+    #only measures with as many pitches in both scores can match, and their pitches then line up
+    same_length = lengths1 == lengths2
+    selected1 = same_length[measures1]
+    selected2 = same_length[measures2]
+
+    different = codes1[selected1] != codes2[selected2]
+    mismatches = numpy.bincount(measures1[selected1][different], minlength = count)
+
+    return same_length & (mismatches == 0)
+
+def _differences(values1, offsets1, values2, offsets2):
+    """Lists the differences between the values of one attribute of two measures, in order
+
+    Args:
+      values1 (tuple):  The values of the measure of score 1, or a single value for the whole measure
+
+      offsets1 (tuple):  The offsets of values1, or None when it is a single value
+
+      values2 (tuple):  The values of the measure of score 2
+
+      offsets2 (tuple):  The offsets of values2
+
+    Returns:
+      list.  Difference tuples, empty when the values are the same
+
+    """
+    if(values1 == values2):
+        return []
+
+    if(offsets1 is None):
+        return [Difference('modify', None, values1, None, values2)]
+
+    differences = []
+
+    for operation, index1, index2 in align_sequences(values1, values2):
+
+        if(operation == 'equal'):
+            continue
+
+        if(index1 is None):
+            differences.append(Difference(operation, None, None, offsets2[index2], values2[index2]))
+        elif(index2 is None):
+            differences.append(Difference(operation, offsets1[index1], values1[index1], None, None))
+        else:
+            differences.append(Difference(operation, offsets1[index1], values1[index1],
+                                          offsets2[index2], values2[index2]))
+
+    return differences
+
+def _unordered_differences(values1, offsets1, values2, offsets2):
+    """Lists the values that occur more often in one measure than in the other, ignoring their order
+
+    Args:
+      values1 (tuple):  The values of the measure of score 1
+
+      offsets1 (tuple):  The offsets of values1
+
+      values2 (tuple):  The values of the measure of score 2
+
+      offsets2 (tuple):  The offsets of values2
+
+    Returns:
+      list.  'delete' Difference tuples for the extra values of score 1 followed by 'insert' ones for
+      the extra values of score 2, each in the order they occur
+
+    """
+    unmatched = {}
+
+    for index, value in enumerate(values2):
+        unmatched.setdefault(value, []).append(index)
+
+    #walk the indexes of each value in score 2 forwards as score 1 uses them up
+    used = {}
+    differences = []
+
+    for index, value in enumerate(values1):
+        position = used.get(value, 0)
+
+        if(position < len(unmatched.get(value, ()))):
+            used[value] = position + 1
+        else:
+            differences.append(Difference('delete', offsets1[index], value, None, None))
+
+    extra = sorted(index for value, indexes in unmatched.items() for index in indexes[used.get(value, 0):])
+    differences += [Difference('insert', None, None, offsets2[index], values2[index]) for index in extra]
+
+    return differences
+
+#State of a batch worker process, set up once by _init_batch_worker
+_batch_worker = {}
+
+def diff_batch(reference, candidates, localCorpusPath = '.', processes = None, parts = None, attributes = None,
+               records = False, detailed = False, measures = None):
+    """Compares one reference score against many candidate scores, spreading the candidates over a pool of processes
+
+    The reference is parsed and its features extracted once, in the calling process, and then
+    shared with every worker, so each worker only has to parse its candidates.  Reports are
+    yielded as soon as each candidate is done, which is not necessarily the order of candidates.
+
+    Args:
+      reference (str):  The pathname of the reference score, or a ScoreIndex of it
+
+      candidates (list):  The pathnames of the scores to compare against the reference
+
+    Kwargs:
+      localCorpusPath (str):  A path to a corpus if your files are located elsewhere
+
+      processes (int):  How many worker processes to use, defaults to the number of CPUs; 1 compares in this process
+
+      parts (list):  The part numbers to compare, as for ScoreDiff.diff_all
+
+      attributes (list):  Names from ScoreDiff.attributes to compare, as for ScoreDiff.diff_all
+
+      records (bool):  Report the list of records from ScoreDiff.iter_differences instead of the result of diff_all
+
+      detailed (bool):  Add the differences to every record, as for ScoreDiff.iter_differences
+
+      measures (tuple):  The (start, stop) range of measures of the records, as for ScoreDiff.iter_differences
+
+    Returns:
+      generator.  Yields a (candidate, report, error) tuple per candidate, where report is the
+      result of ScoreDiff.diff_all or the list of records, or None if comparing failed with the
+      error message error
+
+    """
+    import multiprocessing
+
+    if(processes is None):
+        processes = multiprocessing.cpu_count()
+
+    #a private cache parses the reference once for both sides of this ScoreDiff
+    reference_index = ScoreDiff(reference, reference, localCorpusPath, ParseCache(1)).index1
+    reference_index.release()
+    setup = (reference_index, localCorpusPath, parts, attributes, (records, detailed, measures))
+
+    if(processes <= 1):
+
+        _init_batch_worker(*setup)
+
+        for candidate in candidates:
+            yield _diff_batch_candidate(candidate)
+
+        return
+
+    pool = multiprocessing.Pool(processes, _init_batch_worker, setup)
+
+    try:
+        for result in pool.imap_unordered(_diff_batch_candidate, candidates):
+            yield result
+
+    finally:
+        pool.terminate()
+        pool.join()
+
+def _init_batch_worker(reference_index, localCorpusPath, parts, attributes, output):
+    """Keeps the shared state of a batch in the worker process
+
+    Args:
+      reference_index (ScoreIndex):  The released index of the reference score
+
+      localCorpusPath (str):  A path to a corpus if your files are located elsewhere
+
+      parts (list):  The part numbers to compare
+
+      attributes (list):  Names from ScoreDiff.attributes to compare
+
+      output (tuple):  The records, detailed and measures arguments of diff_batch
+
+    """
+    _batch_worker['reference'] = reference_index
+    _batch_worker['localCorpusPath'] = localCorpusPath
+    _batch_worker['parts'] = parts
+    _batch_worker['attributes'] = attributes
+    _batch_worker['output'] = output
+
+def _diff_batch_candidate(candidate):
+    """Compares one candidate against the reference of the batch
+
+    Args:
+      candidate (str):  The pathname of the candidate score
+
+    Returns:
+      tuple.  (candidate, report, error) as yielded by diff_batch
+
+    """
+    try:
+        #every candidate is parsed once, so keeping it in a cache would only hold on to it
+        diff = ScoreDiff(_batch_worker['reference'], candidate, _batch_worker['localCorpusPath'], False)
+        records, detailed, measures = _batch_worker['output']
+
+        if(records):
+            report = list(diff.iter_differences(_batch_worker['parts'], _batch_worker['attributes'], detailed, measures))
+        else:
+            report = diff.diff_all(_batch_worker['parts'], _batch_worker['attributes'])
+
+        return (candidate, report, None)
+
+    except Exception as error:
+        return (candidate, None, str(error))
+
+#The ScoreDiff a measure range worker compares with, set up by diff_all and _init_range_worker
+_range_worker = {}
+
+def _init_range_worker(index1, index2):
+    """Makes sure a measure range worker has the ScoreDiff it compares with
+
+    Forked workers already inherited it from diff_all; otherwise it is rebuilt from the indexes.
+
+    Args:
+      index1 (ScoreIndex):  The index of the first score, released unless the worker was forked
+
+      index2 (ScoreIndex):  The index of the second score
+
+    """
+    if(_range_worker.get('diff') is None):
+        _range_worker['diff'] = ScoreDiff(index1, index2)
+
+def _diff_range(task):
+    """Compares one range of measures in a worker process
+
+    Args:
+      task (tuple):  (part, start, stop, attributes) as used by ScoreDiff.__diff_range__
+
+    Returns:
+      tuple.  (part, start, results) where results holds one dict per measure
+
+    """
+    part, start, stop, attributes = task
+    return (part, start, _range_worker['diff'].__diff_range__(part, start, stop, attributes))
+
+def write_ndjson(records, stream, fields=None):
+    """Writes difference records to a stream as JSON Lines, one line per record as it arrives
+
+    Every line is flushed as soon as it is written, so a consumer reading the other end of a pipe
+    or following a file sees each difference while the comparison is still running.
+
+    Args:
+      records (iterable):  Dicts such as the ones yielded by ScoreDiff.iter_differences
+
+      stream (file):  An open text stream to write to
+
+    Kwargs:
+      fields (dict):  Extra keys added to every record, e.g. the names of the scores
+
+    Returns:
+      int.  The number of records written
+
+    """
+    count = 0
+
+    for line in _ndjson_lines(records, fields):
+
+        stream.write(line)
+        stream.flush()
+        count += 1
+
+    return count
+
+def _ndjson_lines(records, fields = None):
+    """Turns difference records into lines of JSON
+
+    Args:
+      records (iterable):  Dicts such as the ones yielded by ScoreDiff.iter_differences
+
+    Kwargs:
+      fields (dict):  Extra keys added to every record
+
+    Returns:
+      generator.  One str per record, ending with a newline
+
+    """
+    import json
+
+    for record in records:
+
+        record = dict(record) if fields is None else dict(fields, **record)
+
+        if('differences' in record):
+            record['differences'] = [difference._asdict() for difference in record['differences']]
+
+        yield json.dumps(record, sort_keys = True) + "\n"
+
+def format_report(report):
+    """Formats a report from ScoreDiff.diff_all as text, one line per measure that differs
+
+    Args:
+      report (dict):  The result of ScoreDiff.diff_all
+
+    Returns:
+      str
+
+    """
+    lines = []
+
+    for part in sorted(report):
+
+        for msr, results in enumerate(report[part]):
+
+            different = [attribute for attribute in sorted(results) if not results[attribute]]
+
+            if(different):
+
+                lines.append("part " + str(part) + " measure " + str(msr) + ": " + ", ".join(different))
+
+    return "\n".join(lines)
+
+class DiffServer:
+    """A resident HTTP server that answers diff queries from scores kept parsed and extracted in memory
+
+    Starting Python, importing music21 and parsing a score cost far more than comparing two
+    measures, so the server pays them once: the ScoreIndex of every score it has seen is kept in
+    a bounded least recently used cache keyed by the path and contents of the file, together
+    with every measure extracted so far.  Editing a file changes its key, so a stale index is
+    never used.  Requests are answered one at a time::
+
+      GET /diff?score1=a.mxl&score2=b.mxl -- the differences as JSON Lines, one record per line as
+        yielded by ScoreDiff.iter_differences.  Optional parameters: check (may be repeated),
+        parts (e.g. 0,2-3), measures (e.g. 4-12 or 4-) and detailed=1
+      GET /stats -- {"indexes": ..., "hits": ..., "misses": ...} as JSON
+
+    Score names are found as ScoreDiff finds them: in or under localCorpusPath, or in the music21
+    corpus.  The server listens on localhost by default; it
+    reads any score file the process can, so it should not be exposed beyond the machine.
+    serve_forever, shutdown, server_close and server_address are those of the underlying
+    HTTPServer, which is only imported when a DiffServer is created.
+
+    """
+
+    def __init__(self, address=('127.0.0.1', 8000), localCorpusPath='.', maxsize=32):
+        """Initializes a DiffServer object and binds its socket
+
+        Kwargs:
+          address (tuple):  The (host, port) to listen on, port 0 picks a free port
+
+          localCorpusPath (str):  A path to a corpus if your files are located elsewhere
+
+          maxsize (int):  How many score indexes to keep warm
+
+        """
+        try:
+            from BaseHTTPServer import HTTPServer
+        except ImportError:
+            from http.server import HTTPServer
+
+        self.http = HTTPServer(address, _request_handler())
+        self.http.diff_server = self
+        self.server_address = self.http.server_address
+        self.localCorpusPath = localCorpusPath
+
+        #a memory-only ParseCache is a plain LRU and holds the indexes as well as it holds scores
+        self.indexes = ParseCache(maxsize)
+        self.hits = 0
+        self.misses = 0
+
+    def index(self, name):
+        """Gets the warm ScoreIndex of a score, parsing it if it is not cached or the file changed
+
+        The name is resolved to a file like ScoreDiff.__parse__ does, falling back to the music21
+        corpus, and the index is keyed by that file, so every name of the same score shares it.
+
+        Args:
+          name (str):  The pathname of the score, relative to localCorpusPath
+
+        Returns:
+          ScoreIndex
+
+        """
+        path = _find_score(name, self.localCorpusPath)
+
+        if(path is None):
+            path = _music21('corpus').getWork(name)
+
+            if(isinstance(path, list)):
+                path = path[0]
+
+        key = self.indexes.key(str(path))
+        index = self.indexes.get(key)
+
+        if(index is None):
+            self.misses += 1
+            index = ScoreIndex(_music21('converter').parse(str(path)), name)
+            self.indexes.put(key, index)
+        else:
+            self.hits += 1
+
+        return index
+
+    def diff(self, query):
+        """Answers a /diff query
+
+        Args:
+          query (dict):  The parameters of the query, mapping names to lists of values
+
+        Returns:
+          list.  The records of ScoreDiff.iter_differences
+
+        Raises:
+          ScoreException
+
+        """
+        if(not 'score1' in query or not 'score2' in query):
+            raise ScoreException("score1 and score2 are required")
+
+        parts = None if not 'parts' in query else _parse_numbers(query['parts'][0])
+        measures = None if not 'measures' in query else _parse_range(query['measures'][0])
+        detailed = query.get('detailed', ['0'])[0] in ('1', 'true', 'yes')
+
+        diff = ScoreDiff(self.index(query['score1'][0]), self.index(query['score2'][0]), self.localCorpusPath)
+
+        return list(diff.iter_differences(parts, query.get('check'), detailed, measures, keep=True))
+
+    def stats(self):
+        """Answers a /stats query
+
+        Returns:
+          dict.  The number of cached indexes and the cache hits and misses so far
+
+        """
+        return {'indexes': len(self.indexes), 'hits': self.hits, 'misses': self.misses}
+
+    def serve_forever(self):
+        """Answers requests until shutdown is called"""
+        self.http.serve_forever()
+
+    def shutdown(self):
+        """Stops serve_forever, from another thread"""
+        self.http.shutdown()
+
+    def server_close(self):
+        """Closes the socket of the server"""
+        self.http.server_close()
+
+#The request handler class of DiffServer, built by _request_handler when the first server is created
+_handler = {}
+
+def _request_handler():
+    """Builds the class that handles the requests of a DiffServer, importing the HTTP server modules
+
+    Returns:
+      class.  A BaseHTTPRequestHandler subclass that passes queries to the DiffServer of its server
+
+    """
+    if('class' in _handler):
+        return _handler['class']
+
+    import json
+
+    try:
+        from BaseHTTPServer import BaseHTTPRequestHandler
+        from urlparse import parse_qs, urlparse
+    except ImportError:
+        from http.server import BaseHTTPRequestHandler
+        from urllib.parse import parse_qs, urlparse
+
+    class DiffRequestHandler(BaseHTTPRequestHandler):
+        """Handles the requests of a DiffServer
+
+        """
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            server = self.server.diff_server
+
+            try:
+                if(url.path == '/diff'):
+                    self.__respond__(200, 'application/x-ndjson', ''.join(_ndjson_lines(server.diff(parse_qs(url.query)))))
+
+                elif(url.path == '/stats'):
+                    self.__respond__(200, 'application/json', json.dumps(server.stats(), sort_keys = True) + "\n")
+
+                else:
+                    self.__respond__(404, 'application/json', json.dumps({'error': 'no such path ' + url.path}) + "\n")
+
+            except Exception as error:
+                logger.debug("request %s failed", self.path, exc_info = True)
+                self.__respond__(400, 'application/json', json.dumps({'error': str(error)}) + "\n")
+
+        def __respond__(self, status, content_type, body):
+            """Sends a complete response
+
+            Args:
+              status (int):  The HTTP status code
+
+              content_type (str):  The media type of the body
+
+              body (str):  The body of the response
+
+            """
+            body = body.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug("%s " + format, self.address_string(), *args)
+
+    _handler['class'] = DiffRequestHandler
+    return DiffRequestHandler
+
+def serve(port = 8000, host = '127.0.0.1', localCorpusPath = '.', maxsize = 32):
+    """Runs a DiffServer until it is interrupted
+
+    Kwargs:
+      port (int):  The port to listen on
+
+      host (str):  The address to listen on, localhost by default
+
+      localCorpusPath (str):  A path to a corpus if your files are located elsewhere
+
+      maxsize (int):  How many score indexes to keep warm
+
+    """
+    server = DiffServer((host, port), localCorpusPath, maxsize)
+    logger.info("serving ScoreDiff on %s:%s", *server.server_address[:2])
+
+    try:
+        server.serve_forever()
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        server.server_close()
+
+def format_records(records):
+    """Formats records from ScoreDiff.iter_differences as text, one line per measure that differs
+
+    Args:
+      records (iterable):  The records, in score order
+
+    Returns:
+      str
+
+    """
+    lines = []
+    current = None
+
+    for record in records:
+
+        if((record['part'], record['measure']) != current):
+
+            current = (record['part'], record['measure'])
+            lines.append("part " + str(record['part']) + " measure " + str(record['measure']) + ": " + record['attribute'])
+
+        else:
+
+            lines[-1] += ", " + record['attribute']
+
+        for difference in record.get('differences', ()):
+
+            lines.append("  " + record['attribute'] + " " + difference.operation + ": " +
+                         str(difference.value1) + " at " + str(difference.offset1) + " -> " +
+                         str(difference.value2) + " at " + str(difference.offset2))
+
+    return "\n".join(lines)
+
+#The file extensions taken from a directory given on the command line
+_score_extensions = ('.abc', '.krn', '.mid', '.midi', '.musicxml', '.mxl', '.xml')
+
+def _expand_candidates(candidates, localCorpusPath):
+    """Expands the candidate arguments of the command line into score names
+
+    Args:
+      candidates (list):  Pathnames of scores, directories holding scores or glob patterns, relative to localCorpusPath
+
+      localCorpusPath (str):  A path to a corpus if your files are located elsewhere
+
+    Returns:
+      list.  The score names relative to localCorpusPath, in the order given and sorted within a directory or pattern
+
+    """
+    import glob
+
+    names = []
+
+    for candidate in candidates:
+
+        pathname = os.path.join(localCorpusPath, candidate)
+
+        if(os.path.isdir(pathname)):
+            matches = sorted(os.path.join(pathname, name) for name in os.listdir(pathname)
+                             if os.path.splitext(name)[1].lower() in _score_extensions)
+
+        elif(glob.has_magic(candidate)):
+            matches = sorted(glob.glob(pathname))
+
+        else:
+            names.append(candidate)
+            continue
+
+        names += [os.path.relpath(match, localCorpusPath) for match in matches]
+
+    return names
+
+def _parse_numbers(text):
+    """Parses a list of part numbers such as 0,2-3 from the command line
+
+    Args:
+      text (str):  Comma separated numbers and inclusive ranges
+
+    Returns:
+      list.  The numbers in order
+
+    """
+    numbers = []
+
+    for item in text.split(','):
+
+        first, dash, last = item.partition('-')
+        numbers += range(int(first), int(last if dash else first) + 1)
+
+    return numbers
+
+def _parse_range(text):
+    """Parses a measure range such as 4-12, 4- or 4 from the command line
+
+    Args:
+      text (str):  An inclusive range of measures, whose end may be left out
+
+    Returns:
+      tuple.  The (start, stop) range for ScoreDiff.iter_differences
+
+    """
+    first, dash, last = text.partition('-')
+
+    if(not dash):
+        return (int(first), int(first) + 1)
+
+    return (int(first), int(last) + 1 if last else None)
+
+def main(argv = None):
+    """Command line entry point: compares a reference score with one or more candidate scores
+
+    Candidates can be score files, directories of scores or glob patterns.  Every candidate is
+    compared in one run, on a pool of worker processes when there are several of them, and the
+    differences are printed as text or as JSON Lines (see write_ndjson).  With --serve PORT a
+    DiffServer is run instead.
+
+    Kwargs:
+      argv (list):  The command line arguments, defaults to sys.argv[1:]
+
+    Returns:
+      int.  0 if every candidate matches the reference, 1 if any differs or could not be compared
+
+    Raises:
+      SystemExit -- with status 2 on a usage error, such as candidates that match no score or a
+      reference that cannot be read
+
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog = 'scorediff', description = "Compare a reference score with one or more candidate scores")
+    parser.add_argument('reference', nargs = '?', help = "the pathname of the reference score")
+    parser.add_argument('candidates', nargs = '*', help = "the pathnames of the scores to compare with it, directories or glob patterns")
+    parser.add_argument('--corpus', default = '.', help = "a path to a corpus if your files are located elsewhere")
+    parser.add_argument('--check', dest = 'attributes', action = 'append',
+                        choices = ScoreDiff.attributes + ScoreDiff.ignore_order_attributes,
+                        help = "an attribute to compare, may be repeated, defaults to all of them")
+    parser.add_argument('--parts', type = _parse_numbers, default = None, help = "the parts to compare, e.g. 0,2-3")
+    parser.add_argument('--measures', type = _parse_range, default = None, help = "the measures to compare, e.g. 4-12 or 4-")
+    parser.add_argument('--workers', '--processes', dest = 'processes', type = int, default = None,
+                        help = "how many worker processes to use, defaults to the number of CPUs")
+    parser.add_argument('--format', choices = ['text', 'json'], default = 'text', help = "print text or one JSON record per difference")
+    parser.add_argument('--detailed', action = 'store_true', help = "list the notes that differ as well as the attributes")
+    parser.add_argument('--serve', type = int, metavar = 'PORT', default = None, help = "run a DiffServer on localhost instead")
+    parser.add_argument('--cache-size', type = int, default = 32, help = "how many scores the server keeps warm")
+    arguments = parser.parse_args(argv)
+
+    if(not arguments.serve is None):
+        serve(arguments.serve, localCorpusPath = arguments.corpus, maxsize = arguments.cache_size)
+        return 0
+
+    if(arguments.reference is None or not arguments.candidates):
+        parser.error("a reference and at least one candidate are required")
+
+    candidates = _expand_candidates(arguments.candidates, arguments.corpus)
+
+    if(not candidates):
+        parser.error("no candidate scores found in " + ", ".join(arguments.candidates))
+
+    try:
+        #a private cache parses the reference once for both sides of this ScoreDiff
+        reference = ScoreDiff(arguments.reference, arguments.reference, arguments.corpus, ParseCache(1)).index1
+
+    except Exception as error:
+        parser.error("cannot read the reference " + arguments.reference + ": " + str(error))
+
+    processes = arguments.processes
+
+    if(processes is None and len(candidates) == 1):
+        processes = 1
+
+    status = 0
+
+    for candidate, records, error in diff_batch(reference, candidates, arguments.corpus, processes,
+                                                arguments.parts, arguments.attributes, True,
+                                                arguments.detailed, arguments.measures):
+
+        if(not error is None or records):
+            status = 1
+
+        if(arguments.format == 'json'):
+
+            if(not error is None):
+                records = [{'error': error}]
+
+            write_ndjson(records, sys.stdout, {'reference': arguments.reference, 'candidate': candidate})
+            continue
+
+        if(not error is None):
+
+            print(candidate + ": error: " + error)
+
+        elif(records):
+
+            print(candidate + ":\n" + format_records(records))
+
+        else:
+
+            print(candidate + ": no differences")
+
+    return status
+
+"""
+
+.. rubric:: Footnotes
+
+.. [#f2] http://mit.edu/music21/doc/html/moduleArticulations.html?highlight=articulation#music21.articulations
+
+.. [#f1] http://mit.edu/music21/doc/html/moduleSpanner.html
+
+"""
+
+if __name__ == '__main__':
 
+    sys.exit(main())
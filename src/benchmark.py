@@ -0,0 +1,597 @@
+"""
+
+.. module:: benchmark
+    :synopsis: Benchmarks for the ScoreDiff module
+
+Run from this directory::
+
+  python benchmark.py [import] [parse] [extract] [compare] [synthetic] [--runs N]
+                      [--synthetic PARTSxMEASURES ...] [--output FILE] [--compare-with FILE]
+
+Without benchmark names every benchmark is run.  Every measurement is printed as one JSON
+object per line, and written to --output as well, so results can be kept and compared between
+revisions.  With --compare-with, the measurements are checked against an earlier output file
+and any that got more than --threshold times slower are reported, with exit status 1.
+
+Times are the median of --runs repetitions, in milliseconds.
+
+import
+  The time it takes a fresh interpreter to import ScoreDiff, compared with importing music21.
+  ScoreDiff loads music21 the first time a score is parsed, so importing it should take a few
+  tens of milliseconds and music21_loaded should be false.  milliseconds is the import alone and
+  process_milliseconds the whole run of the interpreter.
+
+parse
+  Parsing each of the bundled scores (see scores) from MusicXML, and getting it back from a
+  ParseCache.
+
+extract
+  Extracting the features of every measure of each bundled score, from a freshly parsed copy.
+
+compare
+  Every have_same_* method over every part and measure of each bundled score compared with
+  itself, and the whole-score methods: diff_all, iter_differences, changed_measures,
+  align_measures, have_same_ignore_order, have_same_part_spanners and, when NumPy is installed,
+  pitch_matches and have_same_part_pitches.  microseconds_per_call is the time of one have_same_* call.
+
+synthetic
+  Building, extracting and comparing generated scores with many parts and measures, by default
+  4 parts of 2000 measures and 32 parts of 100 measures.  The second score of each pair has a
+  few measures changed, so the comparisons find differences.
+
+"""
+
+from __future__ import print_function
+import argparse
+import glob
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import timeit
+
+#Directory holding ScoreDiff.py
+directory = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.insert(0, directory)
+
+from ScoreDiff import ParseCache, ScoreDiff, ScoreException, ScoreIndex, _music21
+
+#Directory holding the bundled scores
+corpus = os.path.join(directory, 'test_cases')
+
+#The bundled scores the parse, extract and compare benchmarks use, relative to corpus
+scores = (['bwv66.6.mxl'] +
+          sorted(os.path.basename(name) for name in glob.glob(os.path.join(corpus, 'scriabin_opus_8_*.mxl'))) +
+          ['ravel_sonatine_1.mxl'])
+
+#Imports timed by bench_import, each run in a fresh interpreter
+imports = [('ScoreDiff', 'import ScoreDiff'),
+           ('music21', 'import music21')]
+
+#Sizes of the synthetic scores, as (parts, measures)
+synthetic_sizes = [(4, 2000), (32, 100)]
+
+def _median(times):
+    """Gets the median of a list of times
+
+    Args:
+      times (list):  The times
+
+    Returns:
+      float
+
+    """
+    times = sorted(times)
+    return times[len(times) // 2]
+
+def _time(function, runs, setup = None):
+    """Times a function
+
+    Args:
+      function (callable):  The function to time; it is given the result of setup
+
+      runs (int):  How many times to call it
+
+    Kwargs:
+      setup (callable):  Called before every run, outside of the timing
+
+    Returns:
+      float.  The median time in milliseconds
+
+    """
+    times = []
+
+    for run in range(0, runs):
+
+        argument = None if setup is None else setup()
+        start = timeit.default_timer()
+        function(argument)
+        times.append((timeit.default_timer() - start) * 1000)
+
+    return _median(times)
+
+def _record(benchmark, score, name, milliseconds, runs, **fields):
+    """Builds the record of one measurement
+
+    Args:
+      benchmark (str):  The name of the benchmark
+
+      score (str):  The score or synthetic size measured
+
+      name (str):  What was measured
+
+      milliseconds (float):  The median time
+
+      runs (int):  How many times it was measured
+
+    Kwargs:
+      fields:  More keys of the record
+
+    Returns:
+      dict
+
+    """
+    record = {'benchmark': benchmark, 'score': score, 'name': name, 'milliseconds': round(milliseconds, 3), 'runs': runs}
+    record.update(fields)
+    return record
+
+def _time_statement(statement, runs):
+    """Times a statement in fresh interpreters
+
+    Args:
+      statement (str):  The statement to time
+
+      runs (int):  How many interpreters to start
+
+    Returns:
+      tuple.  (the median time of the statement and the median time of the whole interpreter in
+      milliseconds, the modules loaded afterwards in the last run)
+
+    """
+    script = ("import sys, time; sys.path.insert(0, %r); start = time.time(); %s; "
+              "print(time.time() - start); print(' '.join(sorted(sys.modules)))") % (directory, statement)
+
+    times = []
+    process_times = []
+    modules = []
+
+    with open(os.devnull, 'w') as devnull:
+
+        for run in range(0, runs):
+
+            start = time.time()
+            output = subprocess.check_output([sys.executable, '-c', script], cwd = directory, stderr = devnull)
+            process_times.append((time.time() - start) * 1000)
+
+            lines = output.decode('utf-8').splitlines()
+            times.append(float(lines[-2]) * 1000)
+            modules = lines[-1].split()
+
+    return (_median(times), _median(process_times), modules)
+
+def bench_import(runs = 5):
+    """Measures how long importing ScoreDiff takes
+
+    Kwargs:
+      runs (int):  How many fresh interpreters to time each import in
+
+    Returns:
+      list.  One dict per import in imports, with its name, median times and whether music21 was loaded
+
+    """
+    results = []
+
+    for name, statement in imports:
+
+        try:
+            milliseconds, process_milliseconds, modules = _time_statement(statement, runs)
+
+        except subprocess.CalledProcessError:
+            results.append({'benchmark': 'import', 'name': name, 'error': 'import failed'})
+            continue
+
+        results.append(_record('import', None, name, milliseconds, runs,
+                               process_milliseconds = round(process_milliseconds, 3),
+                               music21_loaded = 'music21' in modules))
+
+    return results
+
+def _parse(name):
+    """Parses a bundled score without any cache
+
+    Args:
+      name (str):  The name of the score, relative to corpus
+
+    Returns:
+      music21.stream.Score
+
+    """
+    return _music21('converter').parse(os.path.join(corpus, name))
+
+def bench_parse(runs = 5):
+    """Measures how long parsing each bundled score takes, with and without a ParseCache
+
+    Kwargs:
+      runs (int):  How many times to parse each score
+
+    Returns:
+      list.  One dict per score and way of parsing
+
+    """
+    results = []
+
+    for name in scores:
+
+        results.append(_record('parse', name, 'converter.parse', _time(lambda ignored: _parse(name), runs), runs))
+
+        cache = ParseCache()
+        key = cache.key(os.path.join(corpus, name))
+        cache.put(key, _parse(name))
+        milliseconds = _time(lambda ignored: cache.get(cache.key(os.path.join(corpus, name))), runs)
+        results.append(_record('parse', name, 'ParseCache.get', milliseconds, runs))
+
+    return results
+
+def _extract(score, name):
+    """Extracts the features of every measure of a score
+
+    Args:
+      score (music21.stream.Score):  The score
+
+      name (str):  Its name
+
+    Returns:
+      ScoreIndex.  The released index
+
+    """
+    index = ScoreIndex(score, name)
+    index.release()
+    return index
+
+def _measure_count(index):
+    """Counts the measures of every part of an index
+
+    Args:
+      index (ScoreIndex):  The index
+
+    Returns:
+      int
+
+    """
+    return sum(index.measure_count(part) for part in range(0, index.part_count()))
+
+def bench_extract(runs = 5):
+    """Measures how long extracting the features of every measure of each bundled score takes
+
+    Every run extracts from a freshly parsed score, since music21 keeps some of what it builds.
+
+    Kwargs:
+      runs (int):  How many times to extract each score
+
+    Returns:
+      list.  One dict per score
+
+    """
+    results = []
+
+    for name in scores:
+
+        milliseconds = _time(lambda score: _extract(score, name), runs, lambda: _parse(name))
+        index = _extract(_parse(name), name)
+        results.append(_record('extract', name, 'ScoreIndex.release', milliseconds, runs,
+                               parts = index.part_count(), measures = _measure_count(index)))
+
+    return results
+
+def _compare(benchmark, label, index1, index2, runs):
+    """Times every comparison on two extracted scores
+
+    Args:
+      benchmark (str):  The name of the benchmark
+
+      label (str):  The score or size the indexes belong to
+
+      index1 (ScoreIndex):  The released index of the first score
+
+      index2 (ScoreIndex):  The released index of the second score
+
+      runs (int):  How many times to time each comparison
+
+    Returns:
+      list.  One dict per comparison
+
+    """
+    results = []
+    diff = ScoreDiff(index1, index2)
+    parts = range(0, min(index1.part_count(), index2.part_count()))
+    cells = [(msr, part) for part in parts
+             for msr in range(0, min(index1.measure_count(part), index2.measure_count(part)))]
+
+    for attribute in ScoreDiff.attributes + ScoreDiff.ignore_order_attributes:
+
+        method = getattr(diff, 'have_same_' + attribute)
+        milliseconds = _time(lambda ignored: [method(msr, part) for msr, part in cells], runs)
+        results.append(_record(benchmark, label, 'have_same_' + attribute, milliseconds, runs, calls = len(cells),
+                               microseconds_per_call = round(milliseconds * 1000 / max(1, len(cells)), 3)))
+
+    whole = [('diff_all', lambda ignored: diff.diff_all()),
+             ('iter_differences', lambda ignored: list(diff.iter_differences())),
+             ('changed_measures', lambda ignored: [diff.changed_measures(part) for part in parts]),
+             ('align_measures', lambda ignored: [diff.align_measures(part) for part in parts]),
+             ('have_same_ignore_order', lambda ignored: [diff.have_same_ignore_order('pitches', part) for part in parts]),
+             ('pitch_matches', lambda ignored: [diff.pitch_matches(part) for part in parts]),
+             ('have_same_part_pitches', lambda ignored: [diff.have_same_part_pitches(part) for part in parts]),
+             ('have_same_part_spanners', lambda ignored: [diff.have_same_part_spanners(part) for part in parts])]
+
+    for name, function in whole:
+
+        try:
+            results.append(_record(benchmark, label, name, _time(function, runs), runs))
+
+        except ScoreException as error:
+            results.append({'benchmark': benchmark, 'score': label, 'name': name, 'error': error.value})
+
+    return results
+
+def bench_compare(runs = 5):
+    """Measures every comparison on each bundled score compared with itself
+
+    Kwargs:
+      runs (int):  How many times to time each comparison
+
+    Returns:
+      list.  One dict per score and comparison
+
+    """
+    results = []
+
+    for name in scores:
+
+        results += _compare('compare', name, _extract(_parse(name), name), _extract(_parse(name), name), runs)
+
+    return results
+
+def synthetic_score(parts, measures, seed = 0, edits = 0.0):
+    """Generates a score with the markings ScoreDiff compares
+
+    Every measure of 4/4 holds four quarter notes or chords with accidentals, articulations,
+    ornaments and slurs here and there, and the key changes every 64 measures.  The same seed
+    gives the same score; with edits, that share of the measures gets different pitches.
+
+    Args:
+      parts (int):  How many parts
+
+      measures (int):  How many measures per part
+
+    Kwargs:
+      seed (int):  The seed of the generated notes
+
+      edits (float):  The share of measures to change, from 0 to 1
+
+    Returns:
+      music21.stream.Score
+
+    """
+    stream = _music21('stream')
+    note = _music21('note')
+    chord = _music21('chord')
+
+    generator = random.Random(seed)
+    editor = random.Random(seed + 1)
+    names = ['C4', 'D4', 'E-4', 'F#4', 'G4', 'A4', 'B-4', 'C5', 'D5', 'E5']
+    score = stream.Score()
+
+    for number in range(0, parts):
+
+        part = stream.Part()
+
+        for msr in range(0, measures):
+
+            measure = stream.Measure(number = msr + 1)
+
+            if(msr == 0):
+                measure.append(_music21('clef').TrebleClef())
+                measure.append(_music21('meter').TimeSignature('4/4'))
+
+            if(msr % 64 == 0):
+                measure.append(_music21('key').KeySignature(generator.randint(-4, 4)))
+
+            edited = editor.random() < edits
+            notes = []
+
+            for beat in range(0, 4):
+
+                pitches = generator.sample(names, 3) if generator.random() < 0.25 else [generator.choice(names)]
+
+                if(edited):
+                    pitches = [editor.choice(names) for pitch in pitches]
+
+                element = chord.Chord(pitches) if len(pitches) > 1 else note.Note(pitches[0])
+                element.quarterLength = 1
+
+                if(generator.random() < 0.1):
+                    element.articulations.append(_music21('articulations').Staccato())
+
+                if(generator.random() < 0.05):
+                    element.expressions.append(_music21('expressions').Trill())
+
+                measure.append(element)
+                notes.append(element)
+
+            if(generator.random() < 0.1):
+                part.insert(0, _music21('spanner').Slur(notes[0], notes[-1]))
+
+            part.append(measure)
+
+        score.insert(0, part)
+
+    return score
+
+def bench_synthetic(runs = 5, sizes = None):
+    """Measures building, extracting and comparing synthetic scores
+
+    Kwargs:
+      runs (int):  How many times to time each comparison; building and extracting are timed once
+
+      sizes (list):  (parts, measures) pairs, defaults to synthetic_sizes
+
+    Returns:
+      list.  One dict per size and measurement
+
+    """
+    results = []
+
+    for parts, measures in (synthetic_sizes if sizes is None else sizes):
+
+        label = str(parts) + 'x' + str(measures)
+
+        start = timeit.default_timer()
+        score1 = synthetic_score(parts, measures)
+        score2 = synthetic_score(parts, measures, edits = 0.01)
+        results.append(_record('synthetic', label, 'build', (timeit.default_timer() - start) * 1000 / 2, 1))
+
+        start = timeit.default_timer()
+        index1 = _extract(score1, label)
+        index2 = _extract(score2, label)
+        results.append(_record('synthetic', label, 'ScoreIndex.release', (timeit.default_timer() - start) * 1000 / 2, 1,
+                               parts = parts, measures = parts * measures))
+
+        results += _compare('synthetic', label, index1, index2, runs)
+
+    return results
+
+#The benchmarks that can be run from the command line, in the order they are run
+benchmarks = [('import', bench_import),
+              ('parse', bench_parse),
+              ('extract', bench_extract),
+              ('compare', bench_compare),
+              ('synthetic', bench_synthetic)]
+
+def _environment():
+    """Describes what the benchmarks run on
+
+    Returns:
+      dict
+
+    """
+    record = {'benchmark': 'environment', 'python': sys.version.split()[0], 'music21': _music21('base').VERSION_STR}
+
+    try:
+        record['numpy'] = __import__('numpy').__version__
+    except ImportError:
+        record['numpy'] = None
+
+    return record
+
+def regressions(results, baseline, threshold):
+    """Finds the measurements that got slower than an earlier run
+
+    Args:
+      results (list):  The records of this run
+
+      baseline (list):  The records of an earlier run
+
+      threshold (float):  How many times slower a measurement may get
+
+    Returns:
+      list.  (record, earlier milliseconds) pairs for every measurement that is too slow
+
+    """
+    earlier = dict(((record.get('benchmark'), record.get('score'), record.get('name')), record['milliseconds'])
+                   for record in baseline if 'milliseconds' in record)
+
+    slower = []
+
+    for record in results:
+
+        previous = earlier.get((record.get('benchmark'), record.get('score'), record.get('name')))
+
+        if(not previous is None and 'milliseconds' in record and record['milliseconds'] > previous * threshold):
+            slower.append((record, previous))
+
+    return slower
+
+def _size(text):
+    """Parses a synthetic score size such as 4x2000 from the command line
+
+    Args:
+      text (str):  The number of parts and of measures, separated by x
+
+    Returns:
+      tuple.  (parts, measures)
+
+    """
+    parts, measures = text.lower().split('x')
+    return (int(parts), int(measures))
+
+def main(argv = None):
+    """Command line entry point: runs benchmarks and prints their results as JSON Lines
+
+    Kwargs:
+      argv (list):  The command line arguments, defaults to sys.argv[1:]
+
+    Returns:
+      int.  0, or 1 if --compare-with found a regression
+
+    """
+    names = [name for name, function in benchmarks]
+
+    parser = argparse.ArgumentParser(description = "Benchmark the ScoreDiff module")
+    parser.add_argument('benchmarks', nargs = '*', help = "the benchmarks to run, out of %s; defaults to all of them" % ", ".join(names))
+    parser.add_argument('--runs', type = int, default = 5, help = "how many times to repeat each measurement")
+    parser.add_argument('--synthetic', dest = 'sizes', type = _size, action = 'append', help = "a synthetic score size such as 4x2000, may be repeated")
+    parser.add_argument('--output', help = "a file to write the results to as well")
+    parser.add_argument('--compare-with', help = "the output of an earlier run to check for regressions")
+    parser.add_argument('--threshold', type = float, default = 1.5, help = "how many times slower a measurement may get")
+    arguments = parser.parse_args(argv)
+
+    for name in arguments.benchmarks:
+        if(not name in names):
+            parser.error("unknown benchmark: " + name)
+
+    results = [_environment()]
+
+    for name, function in benchmarks:
+
+        if(arguments.benchmarks and not name in arguments.benchmarks):
+            continue
+
+        if(name == 'synthetic'):
+            records = function(arguments.runs, arguments.sizes)
+        else:
+            records = function(arguments.runs)
+
+        for record in records:
+            print(json.dumps(record, sort_keys = True))
+            sys.stdout.flush()
+
+        results += records
+
+    if(arguments.output):
+
+        with open(arguments.output, 'w') as f:
+            for record in results:
+                f.write(json.dumps(record, sort_keys = True) + "\n")
+
+    if(arguments.compare_with):
+
+        with open(arguments.compare_with) as f:
+            baseline = [json.loads(line) for line in f if line.strip()]
+
+        slower = regressions(results, baseline, arguments.threshold)
+
+        for record, previous in slower:
+            print("slower: %s %s %s: %.3f ms, was %.3f ms" % (record['benchmark'], record['score'], record['name'],
+                                                              record['milliseconds'], previous), file = sys.stderr)
+
+        if(slower):
+            return 1
+
+    return 0
+
+if __name__ == '__main__':
+
+    sys.exit(main())
@@ -5,6 +5,32 @@ from os.path import abspath
 
 path = abspath('test_cases')
 
+def build_score(measures, slur = None):
+
+	"""Builds a score of one part in memory, with a measure of quarter notes per list of pitch names in measures
+
+	   slur is an optional (first, last) pair of measures to slur from the first note of one to the last note of the other
+	"""
+	from music21 import note, spanner, stream
+
+	notes = []
+	score = stream.Score()
+	score.insert(0, stream.Part())
+
+	for msr in range(0, len(measures)):
+		measure = stream.Measure(number = msr + 1)
+		notes.append([note.Note(name) for name in measures[msr]])
+
+		for element in notes[-1]:
+			measure.append(element)
+
+		score.parts[0].append(measure)
+
+	if(not slur is None):
+		score.parts[0].insert(0, spanner.Slur(notes[slur[0]][0], notes[slur[1]][-1]))
+
+	return score
+
 def test_key(score1, score2, measure=0, part=0):
 
 	"""
@@ -319,6 +345,728 @@ def test_articulations(score1, score2, measure = 0, part = 0):
 	diff = ScoreDiff(score1, score2, path)
 	return diff.have_same_articulations(measure, part)
 
+def test_diff_all(score1, score2, attribute, measure = 0, part = 0):
+
+	"""
+	   >>> test_diff_all('bwv66.6.mxl', 'different_key.mxl', 'key_signature')
+	   False
+
+	   >>> test_diff_all('bwv66.6.mxl', 'different_pitches2.mxl', 'pitches', 2)
+	   False
+
+	   >>> test_diff_all('bwv66.6.mxl', 'different_stems3.mxl', 'stem_directions', 4)
+	   False
+
+	   >>> test_diff_all('bwv66.6.mxl', 'different_time3.mxl', 'time_signature', 4)
+	   False
+
+	   >>> test_diff_all('bwv66.6.mxl', 'different_dynamics.mxl', 'pitches')
+	   True
+
+	"""
+	diff = ScoreDiff(score1, score2, path)
+	return diff.diff_all([part], [attribute])[part][measure][attribute]
+
+def test_iterator_request(score1, score2):
+
+	"""
+	   >>> test_iterator_request('bwv66.6.mxl', 'different_pitches2.mxl')
+	   ([0, 1], [1, 2])
+
+	"""
+	diff = ScoreDiff(score1, score2, path)
+	results = diff.diff_all(iter([0, 1]), iter(['pitches']))
+	records = diff.iter_differences(iter([0]), iter(['pitches']))
+
+	return (sorted(results), [record['measure'] for record in records])
+
+def test_diff_all_matches(score1, score2):
+
+	"""
+	   >>> test_diff_all_matches('bwv66.6.mxl', 'different_accidentals3.mxl')
+	   True
+
+	   >>> test_diff_all_matches('bwv66.6.mxl', 'different_key3.mxl')
+	   True
+
+	   >>> test_diff_all_matches('bwv66.6.mxl', 'different_time2.mxl')
+	   True
+
+	"""
+	diff = ScoreDiff(score1, score2, path)
+	report = diff.diff_all()
+
+	for part in report:
+
+		for measure in range(0, len(report[part])):
+
+			for attribute in report[part][measure]:
+
+				method = getattr(diff, 'have_same_' + attribute)
+
+				if(method(measure, part) != report[part][measure][attribute]):
+
+					return False
+
+	return True
+
+def test_parse_cache(score, serialized = False):
+
+	"""
+	   >>> test_parse_cache('bwv66.6.mxl')
+	   True
+
+	   >>> ScoreDiff('bwv66.6.mxl', 'bwv66.6.mxl', path).score1 is ScoreDiff('bwv66.6.mxl', 'bwv66.6.mxl', path).score1
+	   False
+
+	   >>> test_parse_cache('different_key.mxl', serialized = True)
+	   True
+
+	"""
+	import shutil, tempfile
+
+	directory = tempfile.mkdtemp() if serialized else None
+
+	try:
+		cache = ParseCache(directory = directory)
+		first = ScoreDiff(score, score, path, cache)
+
+		if(not first.score1 is first.score2):
+
+			return False
+
+		if(serialized):
+
+			#a fresh cache over the same directory reads the serialized score instead of parsing
+			cache = ParseCache(directory = directory)
+			second = ScoreDiff(score, score, path, cache).score1
+
+			if(second is first.score1 or len(second.parts) != len(first.score1.parts)):
+
+				return False
+
+		return True
+
+	finally:
+		if(serialized):
+			shutil.rmtree(directory)
+
+def test_release(score1, score2, measure = 0, part = 0):
+
+	"""
+	   >>> test_release('bwv66.6.mxl', 'different_pitches.mxl')
+	   False
+
+	   >>> test_release('bwv66.6.mxl', 'different_key.mxl')
+	   True
+
+	"""
+	diff = ScoreDiff(score1, score2, path)
+	diff.release()
+	return diff.have_same_pitches(measure, part)
+
+def test_batch(reference, candidates, attribute, measure = 0, part = 0, processes = 2):
+
+	"""
+	   >>> test_batch('bwv66.6.mxl', ['different_key.mxl', 'different_pitches.mxl', 'missing.mxl'], 'key_signature')
+	   [('different_key.mxl', False), ('different_pitches.mxl', True), ('missing.mxl', None)]
+
+	   >>> test_batch('bwv66.6.mxl', ['different_pitches2.mxl', 'different_dynamics.mxl'], 'pitches', 1, processes = 1)
+	   [('different_dynamics.mxl', True), ('different_pitches2.mxl', False)]
+
+	"""
+	results = []
+
+	for candidate, report, error in diff_batch(reference, candidates, path, processes, [part], [attribute]):
+
+		if(report is None):
+
+			results.append((candidate, None))
+
+		else:
+
+			results.append((candidate, report[part][measure][attribute]))
+
+	return sorted(results)
+
+def test_parallel_diff(score1, score2, processes = 3, chunk_size = 2):
+
+	"""
+	   >>> test_parallel_diff('bwv66.6.mxl', 'different_pitches2.mxl')
+	   True
+
+	   >>> test_parallel_diff('bwv66.6.mxl', 'different_time3.mxl', 2, None)
+	   True
+
+	"""
+	diff = ScoreDiff(score1, score2, path)
+	return diff.diff_all(processes = processes, chunk_size = chunk_size) == diff.diff_all()
+
+def test_detached(score1, score2, part = 0):
+
+	"""
+	   >>> test_detached('bwv66.6.mxl', 'different_pitches2.mxl')
+	   (False, True, True)
+
+	"""
+	import pickle
+	from ScoreDiff import _diff_range, _init_range_worker, _range_worker
+
+	diff = ScoreDiff(score1, score2, path)
+	indexes = pickle.loads(pickle.dumps((diff.index1.detached(), diff.index2.detached()), pickle.HIGHEST_PROTOCOL))
+
+	#a spawned worker of diff_all rebuilds its ScoreDiff from the copies it is sent
+	_range_worker.clear()
+	_init_range_worker(*indexes)
+
+	try:
+		count = min(diff.index1.measure_count(part), diff.index2.measure_count(part))
+		results = _diff_range((part, 0, count, ScoreDiff.attributes))[2]
+
+	finally:
+		_range_worker.clear()
+
+	return (diff.score1 is None or diff.index1.score is None, indexes[0].score is None, results == diff.diff_all([part])[part])
+
+def test_align(sequence1, sequence2):
+
+	"""
+	   >>> test_align('abcde', 'abXcde')
+	   ['equal', 'equal', 'insert', 'equal', 'equal', 'equal']
+
+	   >>> test_align('abcde', 'acde')
+	   ['equal', 'delete', 'equal', 'equal', 'equal']
+
+	   >>> test_align('xabcy', 'zabcw')
+	   ['modify', 'equal', 'equal', 'equal', 'modify']
+
+	   >>> test_align('AAAABAAAA', 'AAXAAAAAAA')
+	   ['equal', 'equal', 'insert', 'insert', 'equal', 'equal', 'delete', 'equal', 'equal', 'equal', 'equal']
+
+	   >>> test_align('QABABABABW', 'RABABXABABW')
+	   ['modify', 'equal', 'equal', 'equal', 'equal', 'insert', 'equal', 'equal', 'equal', 'equal', 'equal']
+
+	   >>> test_align('abc', 'WXYZ')
+	   ['modify', 'modify', 'modify', 'insert']
+
+	"""
+	return [operation for operation, index1, index2 in align_sequences(list(sequence1), list(sequence2))]
+
+def test_diff_aligned(score1, score2, part = 0):
+
+	"""
+	   >>> test_diff_aligned('bwv66.6.mxl', 'bwv66.6.mxl')
+	   []
+
+	   >>> test_diff_aligned('bwv66.6.mxl', 'different_pitches2.mxl')
+	   [('modify', 1, 1, ['pitches', 'pitches_ignore_order']), ('modify', 2, 2, ['accidentals', 'pitches', 'pitches_ignore_order'])]
+
+	"""
+	differences = []
+
+	for operation, msr1, msr2, results in ScoreDiff(score1, score2, path).diff_aligned(part):
+
+		if(operation != 'equal'):
+
+			differences.append((operation, msr1, msr2, sorted(name for name in results if not results[name])))
+
+	return differences
+
+def test_changed_measures(score1, score2, part = 0):
+
+	"""
+	   >>> test_changed_measures('bwv66.6.mxl', 'bwv66.6.mxl')
+	   []
+
+	   >>> test_changed_measures('bwv66.6.mxl', 'different_pitches2.mxl')
+	   [1, 2]
+
+	"""
+	return ScoreDiff(score1, score2, path).changed_measures(part)
+
+def test_update(score1, score2, edited, part = 0):
+
+	"""
+	   >>> test_update('bwv66.6.mxl', 'different_pitches2.mxl', [1, 2])
+	   ([1, 2], True)
+
+	   >>> test_update('bwv66.6.mxl', 'different_key3.mxl', {0: [5]})
+	   ([5, 6, 7, 8, 9], True)
+
+	"""
+	diff = ScoreDiff(score1, score1, path)
+	diff.diff_all([part])
+	unchanged = diff.index2.features(part, 0)
+	diff.update(score2, 2, edited)
+
+	#the first measure was not edited and comes before any change of context, so it is taken over
+	return (diff.changed_measures(part), diff.index2.features(part, 0) is unchanged)
+
+def test_update_spanners(first, last, edited, part = 0):
+
+	"""
+	   >>> test_update_spanners(None, None, [0])
+	   ([0, 2], [0, 2], False)
+
+	   >>> test_update_spanners(0, 2, [1])
+	   ([], [], True)
+
+	"""
+	#four measures of quarter notes, slurred from measure 0 to 2 in score 1 and in score 2 before the
+	#update, and from measure first to last, or not at all, in the new version of score 2
+	scores = [build_score([['C4'] * 4] * 4, slur) for slur in [(0, 2), (0, 2), None if first is None else (first, last)]]
+
+	diff = ScoreDiff(ScoreIndex(scores[0]), ScoreIndex(scores[1]))
+	diff.diff_all([part])
+	diff.update(ScoreIndex(scores[2]), 2, edited)
+	fresh = ScoreDiff(ScoreIndex(scores[0]), ScoreIndex(scores[2]))
+
+	return (diff.changed_measures(part), fresh.changed_measures(part), diff.have_same_spanners(2, part))
+
+def test_quiet_import():
+
+	"""
+	   >>> test_quiet_import()
+	   (False, 0)
+
+	"""
+	import os, shutil, subprocess, sys, tempfile
+
+	#importing ScoreDiff from another directory must not create files there or configure logging
+	directory = tempfile.mkdtemp()
+
+	try:
+		script = "import logging, sys; sys.path.insert(0, %r); import ScoreDiff; print(len(logging.getLogger().handlers))" % os.path.abspath('.')
+		output = subprocess.check_output([sys.executable, '-c', script], cwd = directory)
+		return (os.path.exists(os.path.join(directory, 'debug.log')), int(output.split()[-1]))
+
+	finally:
+		shutil.rmtree(directory)
+
+def test_lazy_import():
+
+	"""
+	   >>> test_lazy_import()
+	   False
+
+	"""
+	import os, subprocess, sys
+
+	#without site-packages music21 cannot be imported at all, so this fails if ScoreDiff imports it eagerly
+	script = "import sys; sys.path.insert(0, %r); import ScoreDiff; print('music21' in sys.modules)" % os.path.abspath('.')
+	output = subprocess.check_output([sys.executable, '-S', '-c', script])
+	return output.split()[-1] == b'True'
+
+def test_corpus_paths(score, workers = 4):
+
+	"""
+	   >>> test_corpus_paths('bwv66.6.mxl')
+	   [True, True, True, True, True, True, True, True]
+
+	"""
+	import os
+	from multiprocessing.pool import ThreadPool
+
+	#the same score through two different corpus paths, compared concurrently
+	names = [(score, path), (os.path.join(os.path.basename(path), score), os.path.dirname(path))] * 4
+
+	def compare(name):
+		return ScoreDiff(name[0], name[0], name[1], parseCache = ParseCache()).have_same_pitches(1)
+
+	pool = ThreadPool(workers)
+
+	try:
+		return pool.map(compare, names)
+	finally:
+		pool.close()
+		pool.join()
+
+def test_corpus_subdirectory(*names):
+
+	"""
+	   >>> test_corpus_subdirectory('bwv66.6.mxl', 'test_cases/different_key.mxl', 'different_pitches')
+	   ([True, True, True], 1)
+
+	"""
+	import os
+	from ScoreDiff import _corpus_files
+
+	#the scores are in the test_cases folder under the corpus path, not in the corpus path itself
+	corpus = os.path.dirname(path)
+	_corpus_files.pop(corpus, None)
+
+	#count the walks of the corpus path, which every ScoreDiff shares
+	walk = os.walk
+	walks = []
+
+	def counted(top, *args, **kwargs):
+
+		if(top == corpus):
+			walks.append(top)
+
+		return walk(top, *args, **kwargs)
+
+	os.walk = counted
+
+	try:
+		results = [ScoreDiff(name, os.path.join(path, 'bwv66.6.mxl'), corpus).have_same_time_signature(0) for name in names]
+
+	finally:
+		os.walk = walk
+
+	return (results, len(walks))
+
+def test_pitch_matches(score1, score2, part = 0):
+
+	"""
+	   >>> test_pitch_matches('bwv66.6.mxl', 'different_pitches2.mxl')
+	   ([1, 2], [1, 2], False, False)
+
+	   >>> test_pitch_matches('ravel_sonatine_1.mxl', 'ravel_sonatine_1.mxl', 1)
+	   ([], [], True, True)
+
+	"""
+	diff = ScoreDiff(score1, score2, path)
+	ordered = diff.pitch_matches(part)
+	unordered = diff.pitch_matches(part, ignore_order = True)
+
+	#the array comparison must agree with comparing measure by measure
+	for msr in range(0, len(ordered)):
+		assert ordered[msr] == diff.have_same_pitches(msr, part)
+		assert unordered[msr] == diff.have_same_pitches_ignore_order(msr, part)
+
+	return ([msr for msr in range(0, len(ordered)) if not ordered[msr]],
+		[msr for msr in range(0, len(unordered)) if not unordered[msr]],
+		diff.have_same_part_pitches(part), diff.have_same_part_pitches(part, ignore_order = True))
+
+def test_implicit_octave(measures1, measures2):
+
+	"""
+	   >>> test_implicit_octave([['C', 'E-', 'G'], ['C4', 'E'], ['B', 'C']], [['C', 'E-', 'G'], ['C', 'E4'], ['C', 'B']])
+	   ([1, 2], [1], False, False)
+
+	"""
+	#one part of one measure per list of pitch names, some of them without an octave
+	scores = [build_score(measures1), build_score(measures2)]
+
+	diff = ScoreDiff(ScoreIndex(scores[0]), ScoreIndex(scores[1]))
+	ordered = diff.pitch_matches()
+	unordered = diff.pitch_matches(ignore_order = True)
+
+	for msr in range(0, len(ordered)):
+		assert ordered[msr] == diff.have_same_pitches(msr)
+		assert unordered[msr] == diff.have_same_pitches_ignore_order(msr)
+
+	return ([msr for msr in range(0, len(ordered)) if not ordered[msr]],
+		[msr for msr in range(0, len(unordered)) if not unordered[msr]],
+		diff.have_same_part_pitches(), diff.have_same_part_pitches(ignore_order = True))
+
+def test_ignore_order(score1, score2, attribute, part = 0):
+
+	"""
+	   >>> test_ignore_order('bwv66.6.mxl', 'different_articulations.mxl', 'articulations')
+	   ([0], False, True)
+
+	   >>> test_ignore_order('bwv66.6.mxl', 'different_ornaments2.mxl', 'ornaments')
+	   ([0], False, True)
+
+	   >>> test_ignore_order('bwv66.6.mxl', 'different_phrasing.mxl', 'spanners')
+	   ([0], False, True)
+
+	   >>> test_ignore_order('bwv66.6.mxl', 'different_pitches2.mxl', 'accidentals')
+	   ([2], False, False)
+
+	   >>> test_ignore_order('bwv66.6.mxl', 'bwv66.6.mxl', 'pitches')
+	   ([], True, True)
+
+	"""
+	diff = ScoreDiff(score1, score2, path)
+	compare = getattr(diff, 'have_same_' + attribute + '_ignore_order')
+	different = [msr for msr in range(0, diff.index1.measure_count(part)) if not compare(msr, part)]
+
+	#the whole part, then measures 1 and 2 only
+	return (different, diff.have_same_ignore_order(attribute, part), diff.have_same_ignore_order(attribute, part, 1, 3))
+
+def test_chord_stems(score, part = 0):
+
+	"""
+	   >>> test_chord_stems('scriabin_opus_8_no2.mxl', 1)
+	   (0, 16)
+
+	   >>> test_chord_stems('ravel_sonatine_1.mxl')
+	   (0, 18)
+
+	"""
+	index = ScoreDiff(score, score, path).index1
+
+	#every note and chord keeps at least one stem entry, in order
+	dropped = 0
+
+	for msr in range(0, index.measure_count(part)):
+		if(len(index.features(part, msr).stem_directions) < len(index.measures(part)[msr].flat.notes)):
+			dropped += 1
+
+	return (dropped, len(index.features(part, 8).stem_directions))
+
+def test_profile(score1, score2, msr = 0, part = 0):
+
+	"""
+	   >>> test_profile('bwv66.6.mxl', 'different_pitches.mxl')
+	   ([('build_contexts', 2), ('build_measures', 2), ('build_spanner_sites', 2), ('extract', 2), ('flat_notes', 2), ('get_accidentals', 2), ('get_articulations', 2), ('get_ornaments', 2), ('get_pitches', 2), ('get_spanners', 2), ('get_stem_directions', 2), ('have_same_pitches', 1), ('parse', 2)], True)
+
+	"""
+	traced = []
+	profile = Profile(lambda phase, seconds, allocations: traced.append(phase))
+	diff = ScoreDiff(score1, score2, path, profile = profile)
+	diff.have_same_pitches(msr, part)
+
+	stats = profile.stats()
+
+	return (sorted((stat['phase'], stat['calls']) for stat in stats), len(traced) == sum(stat['calls'] for stat in stats))
+
+def test_profile_pickle(score1, score2, msr = 0, part = 0):
+
+	"""
+	   >>> test_profile_pickle('bwv66.6.mxl', 'different_pitches2.mxl', 1)
+	   (None, False, False, 0)
+
+	"""
+	import pickle
+
+	profile = Profile(lambda phase, seconds, allocations: None)
+	diff = ScoreDiff(score1, score2, path, profile = profile)
+
+	#the copies spawned workers of diff_all are sent, and a whole released ScoreDiff
+	indexes = pickle.loads(pickle.dumps((diff.index1.detached(), diff.index2.detached()), pickle.HIGHEST_PROTOCOL))
+	diff.release()
+	copied = pickle.loads(pickle.dumps(diff, pickle.HIGHEST_PROTOCOL))
+	profile.reset()
+
+	return (copied.profile, copied.have_same_pitches(msr, part), ScoreDiff(*indexes).have_same_pitches(msr, part), len(profile.stats()))
+
+def test_flat_notes(score, size = 4, part = 0):
+
+	"""
+	   >>> test_flat_notes('bwv66.6.mxl')
+	   ([(0, 0)], 4, True)
+
+	"""
+	index = ScoreDiff(score, score, path).index1
+	index.flat_notes_size = size
+
+	#music21 caches .flat and .notes itself on some versions, so check what is kept rather than identity
+	index.__flat_notes__(part, 0)
+	index.features(part, 0, keep = False)
+	reused = list(index._flat_notes)
+
+	count = index.measure_count(part)
+
+	for msr in range(0, count):
+		index.features(part, msr)
+
+	return (reused, len(index._flat_notes), list(index._flat_notes) == [(part, msr) for msr in range(count - size, count)])
+
+def test_ornament_classes(*names):
+
+	"""
+	   >>> test_ornament_classes('HalfStepInvertedAppoggiatura', 'HalfStepMordent', 'Fermata', 'Shake')
+	   ('HalfStepInvertedAppoggiatura', 'HalfStepMordent', 'Shake')
+
+	"""
+	from music21 import expressions, note, stream
+
+	notes = stream.Stream()
+
+	for name in names:
+		element = note.Note('C4')
+		element.expressions.append(getattr(expressions, name)())
+		notes.append(element)
+
+	return ScoreIndex(notes).__get_ornaments__(notes.notes)
+
+def test_part_spanners(score1, score2, part = 0):
+
+	"""
+	   >>> test_part_spanners('bwv66.6.mxl', 'different_phrasing.mxl')
+	   (False, (), (('Slur', 0, 0),), 1)
+
+	   >>> test_part_spanners(2, 3)
+	   (False, (('Slur', 0, 2),), (('Slur', 0, 3),), 1)
+
+	   >>> test_part_spanners(3, 3)
+	   (True, (('Slur', 0, 3),), (('Slur', 0, 3),), 0)
+
+	"""
+	scores = [score1, score2]
+
+	#numbers stand for a part of four measures of quarter notes with a slur from the first measure to that one
+	for number, last in enumerate(scores):
+		if(isinstance(last, int)):
+			scores[number] = ScoreIndex(build_score([['C4'] * 4] * 4, (0, last)), 'slur to measure ' + str(last))
+
+	diff = ScoreDiff(scores[0], scores[1], path)
+
+	return (diff.have_same_part_spanners(part), diff.index1.spanner_ranges(part), diff.index2.spanner_ranges(part),
+	        len(diff.have_same_part_spanners(part, detailed = True).differences))
+
+def test_detailed(score1, score2, attribute, msr = 0, part = 0, release = False):
+
+	"""
+	   >>> test_detailed('bwv66.6.mxl', 'bwv66.6.mxl', 'pitches', 1)
+	   (True, [])
+
+	   >>> test_detailed('bwv66.6.mxl', 'different_pitches2.mxl', 'pitches', 2)
+	   (False, [('modify', 0.0, 'C#5', 0.0, 'B#5'), ('modify', 1.0, 'B4', 1.0, 'D4'), ('modify', 2.0, 'A4', 2.0, 'F4'), ('modify', 3.0, 'C#5', 3.0, 'G#5')])
+
+	   >>> test_detailed('bwv66.6.mxl', 'different_pitches2.mxl', 'pitches_ignore_order', 1)
+	   (False, [('delete', 2.0, 'C#5', None, None), ('delete', 3.0, 'E5', None, None), ('insert', None, None, 2.0, 'G#5'), ('insert', None, None, 3.0, 'F5')])
+
+	   >>> test_detailed('bwv66.6.mxl', 'different_pitches2.mxl', 'accidentals', 2)
+	   (False, [('insert', None, None, 0.0, 'sharp')])
+
+	   >>> test_detailed('bwv66.6.mxl', 'different_key3.mxl', 'key_signature', 6)
+	   (False, [('modify', None, 3, None, -2)])
+
+	   >>> test_detailed('bwv66.6.mxl', 'different_pitches2.mxl', 'accidentals', 2, release = True)
+	   (False, [('insert', None, None, None, 'sharp')])
+
+	"""
+	diff = ScoreDiff(score1, score2, path)
+
+	#offsets are collected from the notes, which are gone once the scores are released
+	if(release):
+		diff.release()
+
+	result = getattr(diff, 'have_same_' + attribute)(msr, part, detailed = True)
+
+	differences = [tuple(x if x is None or isinstance(x, (int, float)) else str(x) for x in difference) for difference in result]
+	return (bool(result), differences)
+
+def test_ndjson(score1, score2, attributes = None):
+
+	"""
+	   >>> test_ndjson('bwv66.6.mxl', 'bwv66.6.mxl')
+	   (0, [], 0)
+
+	   >>> test_ndjson('bwv66.6.mxl', 'different_pitches2.mxl', ['pitches', 'accidentals'])
+	   (3, [(1, 'pitches', 4), (2, 'pitches', 4), (2, 'accidentals', 1)], 0)
+
+	"""
+	import json
+
+	try:
+		from StringIO import StringIO
+	except ImportError:
+		from io import StringIO
+
+	diff = ScoreDiff(score1, score2, path)
+	stream = StringIO()
+	count = write_ndjson(diff.iter_differences(attributes = attributes, detailed = True), stream)
+
+	records = [json.loads(line) for line in stream.getvalue().splitlines()]
+
+	#streamed measures are not kept in the index
+	return (count, [(record['measure'], str(record['attribute']), len(record['differences'])) for record in records], len(diff.index1._features))
+
+def test_main(*arguments):
+
+	"""
+	   >>> test_main('bwv66.6.mxl', 'different_pitches2.mxl', '--check', 'pitches', '--check', 'accidentals')
+	   different_pitches2.mxl:
+	   part 0 measure 1: pitches
+	   part 0 measure 2: pitches, accidentals
+	   1
+
+	   >>> test_main('bwv66.6.mxl', 'different_pitches*.mxl', '--measures', '2', '--check', 'pitches', '--workers', '1')
+	   different_pitches.mxl: no differences
+	   different_pitches2.mxl:
+	   part 0 measure 2: pitches
+	   different_pitches3.mxl: no differences
+	   1
+
+	   >>> test_main('bwv66.6.mxl', 'different_key3.mxl', '--parts', '0', '--measures', '6-7', '--check', 'key_signature', '--format', 'json')
+	   {"attribute": "key_signature", "candidate": "different_key3.mxl", "measure": 6, "part": 0, "reference": "bwv66.6.mxl"}
+	   {"attribute": "key_signature", "candidate": "different_key3.mxl", "measure": 7, "part": 0, "reference": "bwv66.6.mxl"}
+	   1
+
+	   >>> test_main('bwv66.6.mxl', 'missing*.mxl')
+	   scorediff: error: no candidate scores found in missing*.mxl
+	   2
+
+	   >>> test_main('missing.mxl', 'bwv66.6.mxl')
+	   scorediff: error: cannot read the reference missing.mxl
+	   2
+
+	"""
+	import sys
+
+	try:
+		from StringIO import StringIO
+	except ImportError:
+		from io import StringIO
+
+	#usage errors are written to stderr, keep the start of the message and the exit status
+	stderr = sys.stderr
+	sys.stderr = StringIO()
+
+	try:
+		return main(['--corpus', path] + list(arguments))
+
+	except SystemExit as error:
+		print(': '.join(sys.stderr.getvalue().splitlines()[-1].split(': ')[0:3]))
+		return error.code
+
+	finally:
+		sys.stderr = stderr
+
+def test_server(*queries):
+
+	"""
+	   >>> test_server('/diff?score1=bwv66.6.mxl&score2=different_pitches2.mxl&check=pitches', '/diff?score1=bwv66.6.mxl&score2=different_pitches2.mxl&check=pitches&measures=2-', '/stats')
+	   [(200, 2), (200, 1), (200, 1)]
+	   [('hits', 2), ('indexes', 2), ('misses', 2)]
+
+	   >>> test_server('/diff?score1=bwv66.6.mxl', '/diff?score1=bwv66.6.mxl&score2=bwv66.6.mxl&check=bogus', '/nothing')
+	   [(400, 1), (400, 1), (404, 1)]
+	   [('hits', 1), ('indexes', 1), ('misses', 1)]
+
+	   >>> test_server('/diff?score1=bwv66.6&score2=bwv66.6.mxl&check=pitches', '/diff?score1=bach/bwv7.7&score2=bwv66.6.mxl&check=time_signature', '/stats')
+	   [(200, 0), (200, 0), (200, 1)]
+	   [('hits', 2), ('indexes', 2), ('misses', 2)]
+
+	"""
+	import threading
+
+	try:
+		from urllib2 import urlopen, HTTPError
+	except ImportError:
+		from urllib.request import urlopen
+		from urllib.error import HTTPError
+
+	server = DiffServer(('127.0.0.1', 0), path, 4)
+	thread = threading.Thread(target = server.serve_forever)
+	thread.start()
+
+	responses = []
+
+	try:
+		for query in queries:
+
+			try:
+				response = urlopen('http://127.0.0.1:%d%s' % (server.server_address[1], query))
+			except HTTPError as error:
+				response = error
+
+			responses.append((response.getcode(), len(response.read().splitlines())))
+
+	finally:
+		server.shutdown()
+		thread.join()
+		server.server_close()
+
+	print(responses)
+	return sorted(server.stats().items())
+
 if __name__ == '__main__':
 
 	import doctest